@@ -1,9 +1,14 @@
 import argparse
+import json
 import os
 import pandas as pd
 
+from src.cities import CityBatchProcessor, NOMINATIM_URL
 from src.circles import CirclesGenerator
+from src.delta import diff_csv_files
 from src.map import Webmap
+from src.metrics import aggregate_metrics, compute_coverage_metrics, metrics_path, save_metrics
+from src.world import WorldLatticeGenerator
 
 
 def main():
@@ -16,15 +21,46 @@ def main():
     country_or_world_group.add_argument('-c', '--country-name', type=str, nargs='+', help='Name of a country you want to get circles for.')
     country_or_world_group.add_argument('-w', '--world', action='store_true', help='Get countries for all countries in the world.')
     country_or_world_group.add_argument('--city-name', type=str, nargs='+', help='Name of a city/-ies you want to get circles for.')
+    country_or_world_group.add_argument('--city-file', type=str, help='Text file with city names, one per line. Processed in batch mode.')
     parser.add_argument('-mn', '--min-radius', type=float, help='Min radius of resulting circles in kilometers. Defaults to 1.', default=1)
     parser.add_argument('-mx', '--max-radius', type=int, help='Max radius of resulting circles in kilometers. Defaults to 10.', default=10)
     parser.add_argument('-m', '--visualize', action='store_true', help='Visualize result using matplotlib.')
     parser.add_argument('-l', '--list-countries', action='store_true', help='List all available countries names')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose mode. Keeps you in touch with program progress.')
+    parser.add_argument('--lattice', action='store_true', help='Generate the whole world on one global lattice of circles, aligned across country borders.')
     parser.add_argument('-o', '--overwrite-files', action='store_true', help='Overwrite existing files in temp directory when processing the whole world.')
     parser.add_argument('-f', '--from-file', type=str, nargs='+', help='Visualize country csv files.')
+    parser.add_argument('--placement', type=str, choices=['grid', 'ladder'], help='Circles placement mode: max radius grid shrunk on borders, or ladder of radii halving from max to min. Defaults to grid.', default='grid')
+    parser.add_argument('-p', '--prune', action='store_true', help='Remove circles that are almost entirely covered by their neighbours.')
+    parser.add_argument('--prune-threshold', type=float, help='Share of circle area covered by neighbours to remove it when pruning. Defaults to 0.95.', default=0.95)
+    parser.add_argument('--time-budget', type=float, help='Stop generation of each country after given amount of seconds and save the best result so far. Region names, pruning and metrics are done after that, outside of the budget.', default=None)
+    parser.add_argument('--resume', action='store_true', help='Resume generation stopped by time budget in previous run.')
+    parser.add_argument('--island-carpets', action='store_true', help='With time budget, cover small islands where no circle fits with min radius circles.')
+    parser.add_argument('--metrics', action='store_true', help='Compute coverage and overlap metrics and save them next to each CSV file.')
+    parser.add_argument('-d', '--delta', action='store_true', help='Compare new CSV files with previous ones of the same radii and save added and removed circles.')
+    parser.add_argument('--delta-from', type=str, help='Previous CSV file to compare new one with, e.g. generated with other radii. Implies --delta.', default=None)
+    parser.add_argument('--diff', type=str, nargs=2, metavar=('OLD', 'NEW'), help='Compare two CSV files and save added and removed circles next to the new one.')
+    parser.add_argument('-b', '--batch', action='store_true', help='Process cities concurrently: fetch shapes in parallel and generate circles in a pool of processes.')
+    parser.add_argument('--concurrency', type=int, help='Max amount of simultaneous city shape requests in batch mode. Defaults to 4.', default=4)
+    parser.add_argument('--workers', type=int, help='Amount of processes generating circles in batch mode. Each of them loads its own copy of world and states datasets. Defaults to amount of CPUs, but not more than 4.', default=None)
+    parser.add_argument('--requests-per-second', type=float, help='Max amount of Nominatim requests per second in batch mode. Defaults to 1.', default=1)
+    parser.add_argument('--nominatim-url', type=str, help='Nominatim search endpoint used in batch mode.', default=NOMINATIM_URL)
     args = parser.parse_args()
 
+    if (args.time_budget is not None or args.resume) and (args.city_name or args.city_file or args.placement != 'grid'):
+        parser.error('--time-budget and --resume work only for countries with grid placement')
+    if args.island_carpets and args.time_budget is None and not args.resume:
+        parser.error('--island-carpets works only with --time-budget or --resume')
+    if args.delta_from:
+        names = args.country_name or args.city_name
+        if not (args.world or names and len(names) == 1 and not args.batch):
+            parser.error('--delta-from works only for a single country, a single city or the whole world')
+        if not os.path.exists(args.delta_from):
+            parser.error(f'--delta-from file {args.delta_from} does not exist')
+        args.delta = True
+    if args.lattice and (not args.world or args.time_budget is not None or args.resume or args.placement != 'grid'):
+        parser.error('--lattice works only in world mode with grid placement and without time budget')
+
     # Generate circles itself
     circles_generator = CirclesGenerator(verbose=args.verbose)
 
@@ -35,21 +71,44 @@ def main():
         for t in countries_list:
             print(t)
 
+    # Batch of cities is fetched and processed concurrently
+    if args.city_file or (args.city_name and args.batch):
+        generate_cities_batch(args)
+
     # When city name given, we will treat it as country
-    if args.city_name:
+    elif args.city_name:
         args.country_name = args.city_name
 
     # When country name given (-c flag)
     if args.country_name:
         for country_name_str in args.country_name:
-            circles_status = circles_generator.generate_circles(
-                country_name_str, args.min_radius, args.max_radius, is_a_city=True if args.city_name else False)
+            if args.time_budget is not None or args.resume:
+                circles_status = generate_circles_within_budget(circles_generator, country_name_str, args)
+            else:
+                circles_status = circles_generator.generate_circles(
+                    country_name_str, args.min_radius, args.max_radius, is_a_city=True if args.city_name else False,
+                    placement=args.placement)
             if type(circles_status) == str:
                 print(circles_status)
             else:
+                if args.placement == 'ladder':
+                    print_ladder_report(circles_generator.ladder_report)
+                if args.prune:
+                    prune_circles(circles_generator, args)
                 circles_generator.add_areas_names()
+                if args.delta:
+                    previous_file_name = keep_previous_output(circles_generator.csv_path(args.min_radius, args.max_radius),
+                                                              args.delta_from)
                 file_name = circles_generator.save_csv(min_r=args.min_radius, max_r=args.max_radius)
                 print(f'CSV file was saved to {file_name}')
+                if args.delta:
+                    write_delta(previous_file_name, file_name, keep_previous=previous_file_name == args.delta_from)
+                if args.time_budget is not None or args.resume:
+                    save_generation_state(circles_generator, args)
+                if args.metrics:
+                    metrics = circles_generator.compute_metrics()
+                    print(f'Metrics file was saved to {save_metrics(metrics, file_name)}')
+                    print_metrics(metrics)
         if args.visualize:
             webmap = Webmap()
             webmap.show(args.country_name, args.min_radius, args.max_radius)
@@ -57,12 +116,135 @@ def main():
     elif args.world:  # -w flag
         generate_world(args)
 
+    if args.diff:
+        print_delta_summary(diff_csv_files(*args.diff), args.diff[1])
+
     if args.from_file:
 
         webmap = Webmap()
         webmap.show(args.from_file, min_r=args.min_radius, max_r=args.max_radius)
 
 
+def prune_circles(circles_generator, args):
+    """Removes redundant circles from last generation and reports result"""
+    report = circles_generator.prune_redundant_circles(args.prune_threshold)
+    print(f'Pruning removed {report["removed"]} circles, {report["kept"]} left '
+          f'(coverage change {report["coverage_change"]:.4%})')
+
+
+def print_ladder_report(report):
+    """Prints statistics of ladder placement"""
+    ratio = f'{report["circles_ratio"]:.2%}' if report['circles_ratio'] is not None else 'N/A'
+    print(f'Ladder placement: {report["circles"]} circles cover {report["coverage"]:.2%} of area, '
+          f'min radius grid would need {report["carpet_circles"]} circles ({ratio} of them used)')
+
+
+def generate_circles_within_budget(circles_generator, country_name, args, temp_dir=False) -> list | str:
+    """Generates circles within time budget, resuming from state of previous run if asked to"""
+    state = circles_generator.load_state(country_name, args.min_radius, args.max_radius, temp_dir) if args.resume else None
+
+    # State without its CSV file is stale, country is generated from scratch then
+    if state and not os.path.exists(circles_generator.csv_path(args.min_radius, args.max_radius, temp_dir, country_name)):
+        state = None
+
+    if state and state['complete']:
+        return f'{country_name} is already complete, nothing to resume'
+
+    if state:
+        circles_generator.load_csv(country_name, args.min_radius, args.max_radius, temp_dir)
+        print(f'Resuming {country_name}: {len(state["pending"])} border cells and islands left')
+
+    return circles_generator.generate_circles_anytime(country_name, args.min_radius, args.max_radius,
+                                                      args.time_budget, resume_state=state,
+                                                      island_carpets=args.island_carpets)
+
+
+def save_generation_state(circles_generator, args, temp_dir=False):
+    """Saves completeness marker and work left undone of last generation and reports it"""
+    file_name = circles_generator.save_state(args.min_radius, args.max_radius, temp_dir)
+    if circles_generator.is_complete:
+        print(f'Generation is complete. State file was saved to {file_name}')
+    else:
+        print(f'Generation is incomplete, {len(circles_generator.pending_work)} border cells and islands left. '
+              f'Run again with --resume to continue. State file was saved to {file_name}')
+
+
+def keep_previous_output(file_path, other_file_path=None) -> str | None:
+    """
+    Renames existing output file, so it can be compared with the new one after that is saved
+    :param file_path: Path of output file
+    :param other_file_path: Path of other previous output to compare with, e.g. one generated with other radii.
+    It's returned as it is, unless it's the output file itself
+    :return: Path of previous output, or None if there is none
+    """
+    if other_file_path and os.path.abspath(other_file_path) != os.path.abspath(file_path):
+        return other_file_path
+
+    if not os.path.exists(file_path):
+        return None
+
+    previous_file_path = f'{os.path.splitext(file_path)[0]}.prev.csv'
+    os.replace(file_path, previous_file_path)
+    return previous_file_path
+
+
+def write_delta(previous_file_path, file_path, keep_previous=False):
+    """Saves circles added and removed since previous output, then removes previous output unless asked to keep it"""
+    if previous_file_path is None:
+        print(f'No previous output for {file_path} found, delta is not created. '
+              f'Use --delta-from to compare with output of other radii')
+        return
+
+    summary = diff_csv_files(previous_file_path, file_path)
+    if not keep_previous:
+        os.remove(previous_file_path)
+    print_delta_summary(summary, file_path)
+
+
+def print_delta_summary(summary, file_path):
+    """Prints amount of changed circles"""
+    print(f'Delta: {summary["added"]} circles added, {summary["removed"]} removed, {summary["unchanged"]} unchanged. '
+          f'Delta files were saved next to {os.path.abspath(file_path)}')
+
+
+def print_metrics(metrics):
+    """Prints main coverage metrics"""
+    coverage = f'{metrics["coverage"]:.2%}' if metrics['coverage'] is not None else 'N/A'
+    overlap_factor = f'{metrics["overlap_factor"]:.2f}' if metrics['overlap_factor'] is not None else 'N/A'
+    print(f'Coverage: {coverage}, overlap factor: {overlap_factor}, '
+          f'uncovered area: {metrics["uncovered_area_km2"]} km2, largest gap: {metrics["largest_gap_km2"]} km2')
+
+
+def print_world_metrics(world_metrics):
+    """Prints coverage and overlap of the whole world"""
+    coverage = f'{world_metrics["coverage"]:.2%}' if world_metrics['coverage'] is not None else 'N/A'
+    overlap_factor = f'{world_metrics["overlap_factor"]:.2f}' if world_metrics['overlap_factor'] is not None else 'N/A'
+    print(f'World coverage: {coverage}, overlap factor: {overlap_factor}')
+
+
+def generate_cities_batch(args):
+    """Generates circles for a batch of cities concurrently"""
+    city_names = list(args.city_name or [])
+    if args.city_file:
+        city_names += CityBatchProcessor.read_city_names(args.city_file)
+
+    processor = CityBatchProcessor(args.min_radius, args.max_radius,
+                                   concurrency=args.concurrency,
+                                   workers=args.workers,
+                                   requests_per_second=args.requests_per_second,
+                                   nominatim_url=args.nominatim_url,
+                                   prune_threshold=args.prune_threshold if args.prune else None,
+                                   placement=args.placement,
+                                   metrics=args.metrics,
+                                   verbose=args.verbose)
+    for message in processor.run(city_names):
+        print(message)
+
+    if args.visualize:
+        webmap = Webmap()
+        webmap.show(city_names, args.min_radius, args.max_radius)
+
+
 def generate_world(args):
     """Generates circles for every country in a world"""
 
@@ -70,22 +252,48 @@ def generate_world(args):
     circles_generator = CirclesGenerator(verbose=args.verbose)
     world = circles_generator.world
     country_names = []  # Placeholder for processed country names to exclude re-running the same country twice
+    metrics_by_country = {}  # Placeholder for coverage metrics of each country
     csvs_dir = './output_files/temp'
     if not os.path.exists(csvs_dir):
         os.mkdir(csvs_dir)
 
-    # Iterate to get each country, save it to csv and merge csv into one big file
-    for index, country in world.iterrows():
-        country_name = country['name']
-        if country_name not in country_names:
-            country_names.append(country_name)
-            if args.overwrite_files or f'{country_name}__{args.min_radius}-{args.max_radius}.csv' not in os.listdir(csvs_dir):
-                print(f'Processing {country_name}...')
-                circles_generator.generate_circles(country_name, args.min_radius, args.max_radius)
-                circles_generator.add_areas_names()
-                circles_generator.save_csv(temp_dir=True, min_r=args.min_radius, max_r=args.max_radius)
-            else:
-                print(f'{country_name} loaded from previous existing CSV file')
+    if args.lattice:
+        metrics_by_country = generate_world_lattice(circles_generator, args, csvs_dir)
+
+    else:
+        # Iterate to get each country, save it to csv and merge csv into one big file
+        for index, country in world.iterrows():
+            country_name = country['name']
+            if country_name not in country_names:
+                country_names.append(country_name)
+                state = circles_generator.load_state(country_name, args.min_radius, args.max_radius, temp_dir=True)
+                is_incomplete = args.resume and state is not None and not state['complete']
+                if args.overwrite_files or is_incomplete or f'{country_name}__{args.min_radius}-{args.max_radius}.csv' not in os.listdir(csvs_dir):
+                    print(f'Processing {country_name}...')
+                    circles_generator.clear_result(country_name)
+                    if args.time_budget is not None or args.resume:
+                        circles_status = generate_circles_within_budget(circles_generator, country_name, args, temp_dir=True)
+                        if type(circles_status) == str:
+                            print(circles_status)
+                            if args.metrics:
+                                metrics_by_country[country_name] = load_country_metrics(country, csvs_dir, args)
+                            continue
+                    else:
+                        circles_generator.generate_circles(country_name, args.min_radius, args.max_radius,
+                                                           placement=args.placement)
+                    if args.prune:
+                        prune_circles(circles_generator, args)
+                    circles_generator.add_areas_names()
+                    file_name = circles_generator.save_csv(temp_dir=True, min_r=args.min_radius, max_r=args.max_radius)
+                    if args.time_budget is not None or args.resume:
+                        save_generation_state(circles_generator, args, temp_dir=True)
+                    if args.metrics:
+                        metrics_by_country[country_name] = circles_generator.compute_metrics()
+                        save_metrics(metrics_by_country[country_name], file_name)
+                else:
+                    print(f'{country_name} loaded from previous existing CSV file')
+                    if args.metrics:
+                        metrics_by_country[country_name] = load_country_metrics(country, csvs_dir, args)
 
     dfs = []  # Dataframes placeholder
 
@@ -98,8 +306,16 @@ def generate_world(args):
 
     merged_df = pd.concat(dfs, ignore_index=True)
     output_path = f'./output_files/1world__{args.min_radius}-{args.max_radius}.csv'
+    if args.delta:
+        previous_output_path = keep_previous_output(output_path, args.delta_from)
     merged_df.to_csv(output_path, index=False)
+    if args.delta:
+        write_delta(previous_output_path, output_path, keep_previous=previous_output_path == args.delta_from)
 
+    if args.metrics:
+        world_metrics = aggregate_metrics(metrics_by_country)
+        print(f'World metrics file was saved to {save_metrics(world_metrics, output_path)}')
+        print_world_metrics(world_metrics)
 
     if args.visualize:
         print('Creating map...')
@@ -109,6 +325,60 @@ def generate_world(args):
     print('World processing finished.')
 
 
+def generate_world_lattice(circles_generator, args, csvs_dir) -> dict:
+    """
+    Generates circles for all countries on one global lattice and saves them to CSV file of each country
+    :return: Dict with coverage metrics of each country, if they are asked for
+    """
+    metrics_by_country = {}
+    world = circles_generator.world
+
+    # Countries saved by previous run are kept, unless they have to be overwritten
+    country_names = []
+    for index, country in world.drop_duplicates('name').iterrows():
+        country_name = country['name']
+        if args.overwrite_files or f'{country_name}__{args.min_radius}-{args.max_radius}.csv' not in os.listdir(csvs_dir):
+            country_names.append(country_name)
+        else:
+            print(f'{country_name} loaded from previous existing CSV file')
+            if args.metrics:
+                metrics_by_country[country_name] = load_country_metrics(country, csvs_dir, args)
+
+    if not country_names:
+        return metrics_by_country
+
+    print('Processing world on global lattice...')
+    lattice = WorldLatticeGenerator(circles_generator)
+    circles_count = lattice.generate(args.min_radius, args.max_radius, country_names)
+
+    total_circles = 0
+    for country_name in circles_count:
+        lattice.select_country(country_name)
+        if args.prune:
+            prune_circles(circles_generator, args)
+        total_circles += len(circles_generator.resulting_circles)
+        file_name = circles_generator.save_csv(temp_dir=True, min_r=args.min_radius, max_r=args.max_radius)
+        if args.metrics:
+            metrics_by_country[country_name] = circles_generator.compute_metrics()
+            save_metrics(metrics_by_country[country_name], file_name)
+
+    print(f'Total {total_circles} circles generated for {len(circles_count)} countries')
+    return metrics_by_country
+
+
+def load_country_metrics(country, csvs_dir, args) -> dict:
+    """Loads metrics of country processed in previous run, or computes them from its CSV file if there are none"""
+    file_path = os.path.join(csvs_dir, f'{country["name"]}__{args.min_radius}-{args.max_radius}.csv')
+    if os.path.exists(metrics_path(file_path)):
+        with open(metrics_path(file_path), encoding='utf-8') as file:
+            return json.load(file)
+
+    df = pd.read_csv(file_path)
+    metrics = compute_coverage_metrics(country.geometry, df['Longitude'], df['Latitude'], df['Radius'])
+    save_metrics(metrics, file_path)
+    return metrics
+
+
 if __name__ == '__main__':
     main()
 
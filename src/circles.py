@@ -9,7 +9,11 @@ import osmnx as ox
 from tqdm import tqdm
 
 import csv
+import json
 import os
+import time
+
+from src.metrics import compute_coverage_metrics
 
 
 class Circle:
@@ -21,6 +25,72 @@ class Circle:
         self.radius = radius
 
 
+def make_ovals(xs, ys, radius_deg, segments=64):
+    """
+    Builds circles shapes for arrays of centers at once. Circles are stretched along longitude to keep their
+    radius in kilometers the same at any latitude.
+    :param xs:
+    :param ys: Arrays with longitudes and latitudes of circles centers
+    :param radius_deg: Radius of circles in degrees of latitude (km divided by 111), one for all or array with each
+    :param segments: Amount of segments in circle outline
+    :return: Array with circles shapes
+    """
+    angles = np.linspace(0, 2 * np.pi, segments + 1)
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    radii = np.broadcast_to(np.asarray(radius_deg, dtype=float), xs.shape)
+    x_scale_facts = np.cos(np.radians(ys))
+    outline_x = xs[:, None] + (radii / x_scale_facts)[:, None] * np.cos(angles)[None, :]
+    outline_y = ys[:, None] + radii[:, None] * np.sin(angles)[None, :]
+    return shapely.polygons(np.stack([outline_x, outline_y], axis=-1))
+
+
+def crosses_border(shapes, ovals, inside):
+    """
+    Finds circles on border of shapes: ones that intersect their shape but are not within it, and don't cover the
+    whole shape either, as in shapely.overlaps. Shapes go first in predicates, so that prepared shapes are used.
+    :param shapes: Shape for all circles or array with shape of each circle
+    :param ovals: Array with circles shapes
+    :param inside: Boolean array with circles that are within their shape
+    :return: Boolean array with circles on border
+    """
+    shapes = np.broadcast_to(np.asarray(shapes, dtype=object), ovals.shape)
+    on_border = ~inside & shapely.intersects(shapes, ovals)
+
+    # Only circle whose bounds contain bounds of its shape can cover the shape
+    ovals_bounds, shapes_bounds = shapely.bounds(ovals), shapely.bounds(shapes)
+    may_cover = on_border & np.all(ovals_bounds[:, :2] <= shapes_bounds[:, :2], axis=1) \
+        & np.all(ovals_bounds[:, 2:] >= shapes_bounds[:, 2:], axis=1)
+    on_border[may_cover] = ~shapely.contains(ovals[may_cover], shapes[may_cover])
+    return on_border
+
+
+def grid_rows(bounds, radius_deg):
+    """
+    Generates rows of circles centers on a grid, where circles touch each other and fit given bounds entirely.
+    Distance between centers along longitude is adjusted to latitude of each row to keep it the same in kilometers.
+    Rows are yielded one by one, so grid over a huge area doesn't have to be kept in memory at once.
+    :param bounds: Tuple with min x, min y, max x and max y of the area
+    :param radius_deg: Radius of circles in degrees of latitude (km divided by 111)
+    :return: Generator of tuples with arrays of longitudes and latitudes of centers in a row
+    """
+    x_min, y_min, x_max, y_max = bounds
+    for y in np.arange(y_min + radius_deg, y_max - radius_deg, radius_deg * 2):
+        radius_deg_lon = radius_deg / np.cos(np.radians(y))
+        x_range = np.arange(x_min + radius_deg_lon, x_max - radius_deg_lon, radius_deg_lon * 2)
+        yield x_range, np.full(len(x_range), y)
+
+
+def grid_centers(bounds, radius_deg):
+    """
+    Generates centers of circles on a grid, see grid_rows
+    :return: Arrays with longitudes and latitudes of centers
+    """
+    rows = list(grid_rows(bounds, radius_deg))
+    if not rows:
+        return np.array([]), np.array([])
+    return np.concatenate([xs for xs, ys in rows]), np.concatenate([ys for xs, ys in rows])
+
+
 class CirclesGenerator:
     def __init__(self, verbose=False):
         self.country_name = None
@@ -28,6 +98,10 @@ class CirclesGenerator:
         self.polygon = None  # Placeholder for shape of a country
         self.filtered_circles = []  # Placeholder for circles within country shape in shape format
         self.resulting_circles = []  # Placeholder for circles in output format - [[x, y], radius]
+        self.ladder_report = None  # Placeholder for statistics of last ladder placement
+        self.pending_work = []  # Placeholder for work left undone when time budget ran out
+        self.is_complete = True  # False when last generation was stopped by time budget
+        self.chunk_size = 10000  # Amount of circles shapes built at once in anytime mode, to keep memory usage low
 
         self.world = gpd.read_file('./data/world-administrative-boundaries/world-administrative-boundaries.shp')  # Shapes of all countries
         self.states = gpd.read_file('./data/ne_10m_admin_1_states_provinces/ne_10m_admin_1_states_provinces.shp')  # Shapes of all states in countries
@@ -47,7 +121,8 @@ class CirclesGenerator:
 
         return city_shape
 
-    def generate_circles(self, country_name, min_circle_radius, max_circle_radius, as_shapes=False, is_a_city=False) -> list | str:
+    def generate_circles(self, country_name, min_circle_radius, max_circle_radius, as_shapes=False, is_a_city=False,
+                         shape=None, placement='grid') -> list | str:
         """
         Generates circles set for given country.
         :param country_name: Country name to generate circles to
@@ -55,11 +130,16 @@ class CirclesGenerator:
         :param max_circle_radius: Max radius for a circle, in kilometers
         :param as_shapes: If true, returns circles shapes instead of coordinates and radius
         :param is_a_city: If true, 'country name' argument is a city name, not country
+        :param shape: DataFrame object with already fetched shape to use instead of looking it up by name
+        :param placement: 'grid' to place max radius circles on a grid and shrink them on borders,
+        'ladder' to fill country with circles of radius halving from max to min (see place_circles_ladder)
         :return: List of
         """
         self.resulting_circles = []  # Clear circles from previous generation
         self.country_name = country_name
-        if not is_a_city:
+        if shape is not None:
+            country = shape
+        elif not is_a_city:
             country = self.world.loc[self.world['name'] == country_name]
         else:
             country = self.get_city_shape(country_name)
@@ -76,6 +156,10 @@ class CirclesGenerator:
         if self.verbose:
             print("Map data loaded...")
 
+        if placement == 'ladder':
+            self.ladder_report = self.place_circles_ladder(polygon, min_circle_radius, max_circle_radius)
+            return self.filtered_circles if as_shapes else self.resulting_circles
+
         # Define circles parameters
         min_radius_km = min_circle_radius
         max_radius_km = max_circle_radius
@@ -134,99 +218,11 @@ class CirclesGenerator:
                     elif shapely.overlaps(circle, polygon):
                         x = circle.centroid.x
                         y = circle.centroid.y
-
-                        x_scale_fact = np.cos(np.radians(y))
-                        x_max_radius_deg = max_radius_deg / x_scale_fact  # Adjusting scales for x coordinate
-
-                        # Find neighbours circle coordinates by generating them and filtering ones that are within country.
-                        # Also store direction to that neighbour. It's coded for further simpler parsing in a following format:
-                        # String of two characters +, - or 0. First character in a string represents x axis, second - y axis.
-                        # + is increasing, - is decreasing, 0 is remaining the same. For example, "+0" means that x value is increased,
-                        # y remains the same, therefore it's direction to the right.
-
-                        top_neighbour = [Point(x, y + max_radius_deg).buffer(max_radius_deg), "0+"]
-                        top_right_neighbour = [Point(x + x_max_radius_deg, y + max_radius_deg).buffer(max_radius_deg), "++"]
-                        right_neighbour = [Point(x + x_max_radius_deg, y).buffer(max_radius_deg), "+0"]
-                        right_bottom_neighbour = [Point(x + x_max_radius_deg, y - max_radius_deg).buffer(max_radius_deg), "+-"]
-                        bottom_neighbour = [Point(x, y - max_radius_deg).buffer(max_radius_deg), "0-"]
-                        bottom_left_neighbour = [Point(x - x_max_radius_deg, y - max_radius_deg).buffer(max_radius_deg), "--"]
-                        left_neighbour = [Point(x - x_max_radius_deg, y).buffer(max_radius_deg), "-0"]
-                        left_top_neighbour = [Point(x - x_max_radius_deg, y + max_radius_deg).buffer(max_radius_deg), "-+"]
-
-                        neighbours = [top_neighbour, top_right_neighbour, right_neighbour,
-                                      right_bottom_neighbour, bottom_neighbour, bottom_left_neighbour,
-                                      left_neighbour, left_top_neighbour]
-
-                        for n in neighbours:
-                            n[0] = scale(n[0], xfact=np.cos(np.radians(y)), yfact=1)
-
-                        filtered_neighbours = [neighbour for neighbour in neighbours if polygon.contains(neighbour[0])]
-
-                        # First we check if there are only one neighbour - in that case direction will be equal to direction
-                        # of that neighbour from our circle point of view.
-                        if len(filtered_neighbours) == 1:
-                            direction = filtered_neighbours[0][1]
-
-                        elif len(filtered_neighbours) == 0:
-                            direction = None
-
-                        # If there are more than one neighbour, we calculate directions by adding them.
-                        else:
-                            # Extract only neighbours that are place not diagonally, because we don't want to count them
-                            non_diagonal_neighobours = [d[1] for d in filtered_neighbours if "0" in d[1]]
-
-                            # Add directions of remaining neighbours to find direction we need to move our circle
-                            _x = 0
-                            _y = 0
-                            for d in non_diagonal_neighobours:
-                                if d[0] == "-":
-                                    _x -= 1
-                                elif d[0] == "+":
-                                    _x += 1
-
-                                if d[1] == "-":
-                                    _y -= 1
-                                elif d[1] == "+":
-                                    _y += 1
-
-                            direction_mapping = {
-                                1: "+",
-                                0: "0",
-                                -1: "-"
-                            }
-
-                            direction = f'{direction_mapping.get(_x)}{direction_mapping.get(_y)}'
-
-                        # Now when we have direction to move our circle, we will move it there decreasing it's radius by min circle radius
-                        # until it will not overlap with border.
-                        if direction:
-                            overlaps = True
-                            radius_deg = (max_radius_km - min_radius_km) / 111
-                            while overlaps and radius_deg >= min_radius_deg:
-                                # Handle x coordinate
-                                if direction[0] == "-":
-                                    x -= min_radius_deg / np.cos(np.radians(y))
-                                elif direction[0] == "+":
-                                    x += min_radius_deg / np.cos(np.radians(y))
-
-                                # Handle y coordinate
-                                if direction[1] == "-":
-                                    y -= min_radius_deg
-                                elif direction[1] == "+":
-                                    y += min_radius_deg
-
-                                new_circle = Point(x, y).buffer(radius_deg)
-                                new_oval = scale(new_circle, xfact=1/x_scale_fact, yfact=1)
-
-                                # If it fits, append it to the array of circles and exit loop
-                                if polygon.contains(new_oval):
-                                    filtered_circles.append(new_oval)
-                                    res_circle = Circle(country_name, [round(x.item(), 7), round(y.item(), 7)], round(radius_deg * 111, 1))
-                                    self.resulting_circles.append(res_circle)
-                                    overlaps = False
-                                # Otherwise reduce radius by min_radius and start again
-                                else:
-                                    radius_deg = radius_deg - min_radius_deg
+                        adjusted_circle = self.adjust_border_circle(country_name, x, y, polygon,
+                                                                    min_circle_radius, max_circle_radius)
+                        if adjusted_circle:
+                            filtered_circles.append(adjusted_circle[0])
+                            self.resulting_circles.append(adjusted_circle[1])
 
                     pbar.update(1)
 
@@ -250,6 +246,433 @@ class CirclesGenerator:
 
         return self.resulting_circles
 
+    def adjust_border_circle(self, country_name, x, y, polygon, min_circle_radius, max_circle_radius):
+        """
+        Moves circle on the country border towards its neighbours within country, reducing its radius until it fits.
+        :param country_name: Name of a country circle belongs to
+        :param x:
+        :param y: Coordinates of max radius circle center on the border
+        :param polygon: Country shape
+        :param min_circle_radius: Minimal radius for a circle, in kilometers
+        :param max_circle_radius: Max radius for a circle, in kilometers
+        :return: Tuple with circle shape and circle in output format, or None if circle doesn't fit anyhow
+        """
+        min_radius_km = min_circle_radius
+        max_radius_km = max_circle_radius
+        max_radius_deg = max_radius_km / 111
+        min_radius_deg = min_radius_km / 111
+
+        x_scale_fact = np.cos(np.radians(y))
+        x_max_radius_deg = max_radius_deg / x_scale_fact  # Adjusting scales for x coordinate
+
+        # Find neighbours circle coordinates by generating them and filtering ones that are within country.
+        # Also store direction to that neighbour. It's coded for further simpler parsing in a following format:
+        # String of two characters +, - or 0. First character in a string represents x axis, second - y axis.
+        # + is increasing, - is decreasing, 0 is remaining the same. For example, "+0" means that x value is increased,
+        # y remains the same, therefore it's direction to the right.
+
+        top_neighbour = [Point(x, y + max_radius_deg).buffer(max_radius_deg), "0+"]
+        top_right_neighbour = [Point(x + x_max_radius_deg, y + max_radius_deg).buffer(max_radius_deg), "++"]
+        right_neighbour = [Point(x + x_max_radius_deg, y).buffer(max_radius_deg), "+0"]
+        right_bottom_neighbour = [Point(x + x_max_radius_deg, y - max_radius_deg).buffer(max_radius_deg), "+-"]
+        bottom_neighbour = [Point(x, y - max_radius_deg).buffer(max_radius_deg), "0-"]
+        bottom_left_neighbour = [Point(x - x_max_radius_deg, y - max_radius_deg).buffer(max_radius_deg), "--"]
+        left_neighbour = [Point(x - x_max_radius_deg, y).buffer(max_radius_deg), "-0"]
+        left_top_neighbour = [Point(x - x_max_radius_deg, y + max_radius_deg).buffer(max_radius_deg), "-+"]
+
+        neighbours = [top_neighbour, top_right_neighbour, right_neighbour,
+                      right_bottom_neighbour, bottom_neighbour, bottom_left_neighbour,
+                      left_neighbour, left_top_neighbour]
+
+        for n in neighbours:
+            n[0] = scale(n[0], xfact=np.cos(np.radians(y)), yfact=1)
+
+        filtered_neighbours = [neighbour for neighbour in neighbours if polygon.contains(neighbour[0])]
+
+        # First we check if there are only one neighbour - in that case direction will be equal to direction
+        # of that neighbour from our circle point of view.
+        if len(filtered_neighbours) == 1:
+            direction = filtered_neighbours[0][1]
+
+        elif len(filtered_neighbours) == 0:
+            direction = None
+
+        # If there are more than one neighbour, we calculate directions by adding them.
+        else:
+            # Extract only neighbours that are place not diagonally, because we don't want to count them
+            non_diagonal_neighobours = [d[1] for d in filtered_neighbours if "0" in d[1]]
+
+            # Add directions of remaining neighbours to find direction we need to move our circle
+            _x = 0
+            _y = 0
+            for d in non_diagonal_neighobours:
+                if d[0] == "-":
+                    _x -= 1
+                elif d[0] == "+":
+                    _x += 1
+
+                if d[1] == "-":
+                    _y -= 1
+                elif d[1] == "+":
+                    _y += 1
+
+            direction_mapping = {
+                1: "+",
+                0: "0",
+                -1: "-"
+            }
+
+            direction = f'{direction_mapping.get(_x)}{direction_mapping.get(_y)}'
+
+        # Now when we have direction to move our circle, we will move it there decreasing it's radius by min circle radius
+        # until it will not overlap with border.
+        if direction:
+            radius_deg = (max_radius_km - min_radius_km) / 111
+            while radius_deg >= min_radius_deg:
+                # Handle x coordinate
+                if direction[0] == "-":
+                    x -= min_radius_deg / np.cos(np.radians(y))
+                elif direction[0] == "+":
+                    x += min_radius_deg / np.cos(np.radians(y))
+
+                # Handle y coordinate
+                if direction[1] == "-":
+                    y -= min_radius_deg
+                elif direction[1] == "+":
+                    y += min_radius_deg
+
+                new_circle = Point(x, y).buffer(radius_deg)
+                new_oval = scale(new_circle, xfact=1/x_scale_fact, yfact=1)
+
+                # If it fits, return it
+                if polygon.contains(new_oval):
+                    return new_oval, Circle(country_name, [round(float(x), 7), round(float(y), 7)], round(radius_deg * 111, 1))
+                # Otherwise reduce radius by min_radius and start again
+                else:
+                    radius_deg = radius_deg - min_radius_deg
+
+        return None
+
+    def generate_circles_anytime(self, country_name, min_circle_radius, max_circle_radius, time_budget=None,
+                                 resume_state=None, island_carpets=False) -> list | str:
+        """
+        Generates circles set for given country within time budget. Work is ordered by its value: interior max radius
+        circles first, then circles on borders of country parts from the largest part to the smallest, then small
+        islands. When budget runs out, generation stops and keeps the best result so far. Work that is left is
+        stored in self.pending_work, so a later run can resume from there (see save_state). Once all work is done,
+        result is the same as of generate_circles.
+        :param country_name: Country name to generate circles to
+        :param min_circle_radius: Minimal radius for a circle, in kilometers
+        :param max_circle_radius: Max radius for a circle, in kilometers
+        :param time_budget: Time budget in seconds. If None, all work is done
+        :param resume_state: State saved by a previous run. Its circles have to be loaded with load_csv before the call
+        :param island_carpets: If true, small islands where no circle fits are covered with min radius circles
+        :return: List of circles or string with error
+        """
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        self.country_name = country_name
+        country = self.world.loc[self.world['name'] == country_name]
+
+        if country.empty:
+            return "Country not found in the dataset"
+
+        polygon = country.geometry.iloc[0]
+        self.polygon = polygon
+        self.bounding_box = box(*polygon.bounds)
+        shapely.prepare(polygon)
+        parts = np.array(polygon.geoms) if hasattr(polygon, 'geoms') else np.array([polygon])
+
+        max_radius_deg = max_circle_radius / 111
+        min_radius_deg = min_circle_radius / 111
+
+        # Border cells are done part by part, from the largest part to the smallest. Parts smaller than max radius
+        # circle are treated as small islands and go last
+        parts_order = np.argsort(-shapely.area(parts))
+        parts_x_scale_facts = np.cos(np.radians(shapely.get_y(shapely.centroid(parts))))
+        is_island = shapely.area(parts) < np.pi * max_radius_deg ** 2 / parts_x_scale_facts
+        parts_order = np.concatenate([parts_order[~is_island[parts_order]], parts_order[is_island[parts_order]]])
+        parts_rank = np.empty(len(parts), dtype=int)
+        parts_rank[parts_order] = np.arange(len(parts))
+
+        if resume_state:
+            pending_work = resume_state['pending']
+        else:
+            self.resulting_circles = []
+            self.filtered_circles = []
+            self.pending_work = []
+
+            # Grid is scanned for interior circles first, border cells found on the way are done after it
+            pending_work = [{'type': 'grid', 'row': 0}]
+            if island_carpets:
+                pending_work += [{'type': 'island', 'part': int(i)} for i in parts_order[is_island[parts_order]]]
+
+        if pending_work and pending_work[0]['type'] == 'grid':
+            border_work, next_row = self.scan_grid(country_name, polygon, parts, max_circle_radius,
+                                                   pending_work[0]['row'], deadline)
+            border_work += [work for work in pending_work if work['type'] == 'border']
+            border_work.sort(key=lambda work: parts_rank[work['part']])
+            pending_work = ([{'type': 'grid', 'row': next_row}] if next_row is not None else []) + border_work + \
+                [work for work in pending_work if work['type'] == 'island']
+
+        if self.verbose:
+            print(f"Interior circles generated, {len(pending_work)} border cells and islands left...")
+
+        done = 0
+        with tqdm(total=len(pending_work), desc="Adjusting circles on borders", unit="circle") as pbar:
+            for work in pending_work:
+                # Grid that is not scanned through means that budget has run out already
+                if work['type'] == 'grid' or deadline is not None and time.monotonic() > deadline:
+                    break
+
+                if work['type'] == 'border':
+                    adjusted_circle = self.adjust_border_circle(country_name, work['x'], work['y'], polygon,
+                                                                min_circle_radius, max_circle_radius)
+                    if adjusted_circle:
+                        self.filtered_circles.append(adjusted_circle[0])
+                        self.resulting_circles.append(adjusted_circle[1])
+
+                # If no circle fit in the island, cover it with min radius circles
+                elif work['type'] == 'island':
+                    part = parts[work['part']]
+                    centers = np.array([circle.coordinates for circle in self.resulting_circles]).reshape(-1, 2)
+                    if not shapely.contains_xy(part, centers[:, 0], centers[:, 1]).any():
+                        xs, ys = grid_centers(part.bounds, min_radius_deg)
+                        ovals = make_ovals(xs, ys, min_radius_deg)
+                        inside = shapely.contains(part, ovals) if len(ovals) else np.array([], dtype=bool)
+                        for x, y, oval in zip(xs[inside], ys[inside], ovals[inside]):
+                            self.filtered_circles.append(oval)
+                            self.resulting_circles.append(Circle(country_name, [round(float(x), 7), round(float(y), 7)],
+                                                                 round(min_circle_radius, 1)))
+
+                done += 1
+                pbar.update(1)
+
+        self.pending_work = pending_work[done:]
+        self.is_complete = not self.pending_work
+
+        # As in generate_circles, country too small for max radius circles is covered with min radius ones
+        if self.is_complete and not self.resulting_circles:
+            self.generate_circles(country_name, min_circle_radius, max_circle_radius)
+
+        if self.verbose:
+            print(f'Total {len(self.resulting_circles)} circles generated')
+            if not self.is_complete:
+                print(f'Time budget ran out, {len(self.pending_work)} border cells and islands left')
+
+        return self.resulting_circles
+
+    def scan_grid(self, country_name, polygon, parts, max_circle_radius, first_row=0, deadline=None) -> tuple:
+        """
+        Scans grid of max radius circles over country bounds in chunks of rows. Circles within country are added
+        to the result, and circles crossing its border are returned as border work.
+        :param country_name: Country name to generate circles to
+        :param polygon: Prepared country shape
+        :param parts: Array with polygons of country shape
+        :param max_circle_radius: Max radius for a circle, in kilometers
+        :param first_row: Index of grid row to start from
+        :param deadline: Time after which scanning stops, in time.monotonic() seconds
+        :return: Tuple with list of border work and index of the next row to scan, or None if grid is scanned through
+        """
+        max_radius_deg = max_circle_radius / 111
+        parts_tree = shapely.STRtree(parts)
+        parts_by_area = np.argsort(-shapely.area(parts))
+        parts_area_rank = np.empty(len(parts), dtype=int)
+        parts_area_rank[parts_by_area] = np.arange(len(parts))
+        border_work = []
+
+        def scan_chunk(xs, ys):
+            ovals = make_ovals(xs, ys, max_radius_deg)
+            inside = shapely.contains(polygon, ovals)
+            for x, y, oval in zip(xs[inside], ys[inside], ovals[inside]):
+                self.filtered_circles.append(oval)
+                self.resulting_circles.append(Circle(country_name, [round(float(x), 7), round(float(y), 7)],
+                                                     round(max_circle_radius)))
+
+            on_border = crosses_border(polygon, ovals, inside)
+
+            # Every border circle belongs to the largest part it touches
+            oval_ids, part_ids = parts_tree.query(ovals[on_border], predicate='intersects')
+            largest_part = np.full(on_border.sum(), len(parts))
+            np.minimum.at(largest_part, oval_ids, parts_area_rank[part_ids])
+            border_parts = parts_by_area[largest_part]
+
+            border_work.extend({'type': 'border', 'x': float(x), 'y': float(y), 'part': int(part)}
+                               for x, y, part in zip(xs[on_border], ys[on_border], border_parts))
+
+        chunk_xs, chunk_ys = [], []
+        chunk_len = 0
+        row = -1
+        for row, (xs, ys) in enumerate(grid_rows(polygon.bounds, max_radius_deg)):
+            if row < first_row:
+                continue
+
+            chunk_xs.append(xs)
+            chunk_ys.append(ys)
+            chunk_len += len(xs)
+            if chunk_len >= self.chunk_size:
+                scan_chunk(np.concatenate(chunk_xs), np.concatenate(chunk_ys))
+                chunk_xs, chunk_ys = [], []
+                chunk_len = 0
+                if deadline is not None and time.monotonic() > deadline:
+                    return border_work, row + 1
+
+        if chunk_len:
+            scan_chunk(np.concatenate(chunk_xs), np.concatenate(chunk_ys))
+
+        return border_work, None
+
+    def place_circles_ladder(self, polygon, min_circle_radius, max_circle_radius, min_uncovered_share=0.1) -> dict:
+        """
+        Places circles with radius levels going down from max radius in geometric steps (10, 5, 2.5, 1.25...) while
+        it's not less than min radius. Each finer level fills only space that is not covered by coarser ones.
+        Uncovered space is searched with a quadtree: every cell is fully covered by a circle of its level placed in
+        cell center. If that circle doesn't fit in a country shape, cell is split in 4 cells of the next level,
+        and cells that are mostly covered by placed circles already are dropped.
+        :param polygon: Country shape
+        :param min_circle_radius: Minimal radius for a circle, in kilometers
+        :param max_circle_radius: Max radius for a circle, in kilometers
+        :param min_uncovered_share: Minimal share of cell's land that has to be uncovered to keep the cell,
+        estimated on sample points
+        :return: Dict with radius levels, amount of circles on each level, coverage and comparison with amount of
+        min radius circles on a regular grid
+        """
+        radii = []
+        radius = max_circle_radius
+        while radius >= min_circle_radius:
+            radii.append(radius)
+            radius /= 2
+        radii = radii or [min_circle_radius]
+
+        def cells_width(cells_y, height):
+            """
+            Cells are squares in kilometers, so their width in degrees depends on latitude. We take cell edge closest
+            to equator to be sure that circle covers its cell entirely
+            """
+            crosses_equator = (cells_y <= 0) & (cells_y + height >= 0)
+            closest_to_equator_lat = np.where(crosses_equator, 0, np.minimum(np.abs(cells_y), np.abs(cells_y + height)))
+            return height / np.cos(np.radians(closest_to_equator_lat))
+
+        # Square with side r * sqrt(2) is the biggest one that circle with radius r covers
+        minx, miny, maxx, maxy = polygon.bounds
+        cell_height = radii[0] / 111 * np.sqrt(2)
+        cells_x, cells_y = [], []
+        for y in np.arange(miny, maxy, cell_height):
+            x_range = np.arange(minx, maxx, cells_width(y, cell_height))
+            cells_x.append(x_range)
+            cells_y.append(np.full(len(x_range), y))
+        cells_x, cells_y = np.concatenate(cells_x), np.concatenate(cells_y)
+        cells_w = cells_width(cells_y, cell_height)
+
+        shapely.prepare(polygon)
+        uncovered = polygon
+        samples_per_side = 4  # Cell is sampled with 4 x 4 points to estimate its uncovered share
+        self.filtered_circles = []
+        self.resulting_circles = []
+        circles_per_level = []
+
+        for radius in radii:
+            # Drop cells that are already covered
+            cells = shapely.box(cells_x, cells_y, cells_x + cells_w, cells_y + cell_height)
+            shapely.prepare(uncovered)
+            is_uncovered = shapely.intersects(uncovered, cells)
+            if uncovered is not polygon:
+                # Estimate uncovered share of cell's land on a grid of sample points in each cell
+                sample_steps = (np.arange(samples_per_side) + 0.5) / samples_per_side
+                sample_x = (cells_x[is_uncovered, None, None] + cells_w[is_uncovered, None, None] * sample_steps[None, None, :])
+                sample_y = (cells_y[is_uncovered, None, None] + cell_height * sample_steps[None, :, None])
+                sample_x, sample_y = np.broadcast_arrays(sample_x, sample_y)
+                land_samples = shapely.contains_xy(polygon, sample_x, sample_y).sum(axis=(1, 2))
+                uncovered_samples = shapely.contains_xy(uncovered, sample_x, sample_y).sum(axis=(1, 2))
+
+                # Cells whose land is too small to be sampled are kept, since they touch uncovered space anyway
+                is_uncovered[is_uncovered] = (land_samples == 0) | (uncovered_samples >= min_uncovered_share * land_samples)
+            cells_x, cells_y, cells_w = cells_x[is_uncovered], cells_y[is_uncovered], cells_w[is_uncovered]
+
+            centers_x = cells_x + cells_w / 2
+            centers_y = cells_y + cell_height / 2
+            ovals = make_ovals(centers_x, centers_y, radius / 111)
+            fits = shapely.contains(polygon, ovals) if len(ovals) else np.array([], dtype=bool)
+
+            for x, y, oval in zip(centers_x[fits], centers_y[fits], ovals[fits]):
+                self.filtered_circles.append(oval)
+                self.resulting_circles.append(Circle(self.country_name, [round(x.item(), 7), round(y.item(), 7)],
+                                                     round(radius, 2)))
+            circles_per_level.append(int(fits.sum()))
+
+            if fits.any():
+                uncovered = uncovered.difference(shapely.union_all(ovals[fits]))
+
+            # Split cells where circle didn't fit in 4 smaller ones
+            cell_height /= 2
+            cells_x, cells_y, cells_w = cells_x[~fits], cells_y[~fits], cells_w[~fits] / 2
+            cells_x = np.concatenate([cells_x, cells_x + cells_w, cells_x, cells_x + cells_w])
+            cells_y = np.concatenate([cells_y, cells_y, cells_y + cell_height, cells_y + cell_height])
+            cells_w = np.concatenate([cells_w] * 4)
+
+        # Amount of min radius circles in a regular grid that would be needed to cover country instead
+        min_radius_deg = min_circle_radius / 111
+        carpet_circles = 0
+        for y in np.arange(miny + min_radius_deg, maxy, min_radius_deg * 2):
+            radius_deg_lon = min_radius_deg / np.cos(np.radians(y))
+            x_range = np.arange(minx + radius_deg_lon, maxx, radius_deg_lon * 2)
+            carpet_circles += int(shapely.contains_xy(polygon, x_range, np.full(len(x_range), y)).sum())
+
+        report = {
+            'radii': radii,
+            'circles_per_level': circles_per_level,
+            'circles': len(self.resulting_circles),
+            'carpet_circles': carpet_circles,
+            'circles_ratio': len(self.resulting_circles) / carpet_circles if carpet_circles else None,
+            'coverage': 1 - uncovered.area / polygon.area,
+        }
+
+        if self.verbose:
+            print(f'{report["circles"]} circles placed on levels {radii} km ({circles_per_level}), '
+                  f'covering {report["coverage"]:.2%} of area. Min radius grid would need {carpet_circles} circles')
+
+        return report
+
+    def prune_redundant_circles(self, coverage_threshold=0.95) -> dict:
+        """
+        Removes circles whose area is covered by their neighbours beyond given threshold.
+        Smaller circles are checked first, since adjusted border circles are the most likely to be covered by others.
+        :param coverage_threshold: Share of circle area (from 0 to 1) that has to be covered by neighbours to drop it
+        :return: Dict with number of removed and kept circles and change of covered share of country area
+        """
+        circles = self.filtered_circles or []
+        kept = np.ones(len(circles), dtype=bool)
+        lost_area = 0  # Area that is not covered anymore after removing circles
+
+        # Spatial index over final circles, so we only check neighbours that actually touch the circle
+        tree = shapely.STRtree(circles)
+        order = np.argsort(shapely.area(circles)) if circles else []
+
+        with tqdm(total=len(circles), desc="Pruning redundant circles", unit="circle") as pbar:
+            for i in order:
+                circle = circles[i]
+                neighbours = [circles[j] for j in tree.query(circle, predicate='intersects') if j != i and kept[j]]
+                if neighbours:
+                    covered_area = shapely.union_all(neighbours).intersection(circle).area
+                    if covered_area >= coverage_threshold * circle.area:
+                        kept[i] = False
+                        lost_area += max(circle.area - covered_area, 0)  # Float error can make it slightly negative
+                pbar.update(1)
+
+        self.filtered_circles = [c for c, k in zip(circles, kept) if k]
+        self.resulting_circles = [c for c, k in zip(self.resulting_circles, kept) if k]
+
+        report = {
+            'removed': int((~kept).sum()),
+            'kept': int(kept.sum()),
+            'coverage_change': -lost_area / self.polygon.area if self.polygon is not None else 0,
+        }
+
+        if self.verbose:
+            print(f'{report["removed"]} redundant circles removed, {report["kept"]} left. '
+                  f'Covered share of area changed by {report["coverage_change"]:.4%}')
+
+        return report
+
     def add_areas_names(self):
         """
         Adds to each circle name of a state/region where it's located
@@ -299,12 +722,9 @@ class CirclesGenerator:
         :param max_r: Min and max radius of circles to mark them in filename
         :return: String with resulted file name
         """
-        if temp_dir:
-            dir_path = './output_files/temp'
-        else:
-            dir_path = './output_files'
+        file_path = self.csv_path(min_r, max_r, temp_dir)
 
-        with open(f'{dir_path}/{self.country_name}__{min_r}-{max_r}.csv', 'w', newline='', encoding='utf-8') as file:
+        with open(file_path, 'w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
 
             column_names = ['Region', 'Latitude', 'Longitude', 'Radius']
@@ -316,7 +736,87 @@ class CirclesGenerator:
 
             writer.writerows(data)
 
-        return os.path.abspath(f'./output_files/{self.country_name}.csv')
+        return os.path.abspath(file_path)
+
+    def csv_path(self, min_r, max_r, temp_dir=False, country_name=None) -> str:
+        """Returns path of CSV file with circles of given country, or of last generated one if none is given"""
+        if temp_dir:
+            dir_path = './output_files/temp'
+        else:
+            dir_path = './output_files'
+
+        return f'{dir_path}/{country_name or self.country_name}__{min_r}-{max_r}.csv'
+
+    def clear_result(self, country_name=None):
+        """Forgets circles and pending work of last generation, so they can't be saved as result of another country"""
+        self.country_name = country_name
+        self.resulting_circles = []
+        self.filtered_circles = []
+        self.pending_work = []
+        self.is_complete = True
+
+    def load_csv(self, country_name, min_r, max_r, temp_dir=False):
+        """Loads circles saved by previous run as result of last generation"""
+        self.country_name = country_name
+        self.resulting_circles = []
+        with open(self.csv_path(min_r, max_r, temp_dir), newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                self.resulting_circles.append(Circle(country_name, [float(row['Longitude']), float(row['Latitude'])],
+                                                     float(row['Radius']), state=row['Region'][len(country_name) + 1:]))
+
+        self.filtered_circles = list(make_ovals([circle.coordinates[0] for circle in self.resulting_circles],
+                                                [circle.coordinates[1] for circle in self.resulting_circles],
+                                                [circle.radius / 111 for circle in self.resulting_circles]))
+
+    def state_path(self, min_r, max_r, temp_dir=False, country_name=None) -> str:
+        """Returns path of file with generation state that belongs to CSV file of given or last generated country"""
+        return f'{os.path.splitext(self.csv_path(min_r, max_r, temp_dir, country_name))[0]}.state.json'
+
+    def save_state(self, min_r, max_r, temp_dir=False) -> str:
+        """
+        Saves completeness marker of last generation and work left undone, to resume from it later.
+        Uncovered remainder is described by grid rows not scanned yet, pending border cells (centers of max radius
+        circles) and islands.
+        :return: String with resulted file name
+        """
+        grid = [work for work in self.pending_work if work['type'] == 'grid']
+        border_cells = [work for work in self.pending_work if work['type'] == 'border']
+        islands = [work for work in self.pending_work if work['type'] == 'island']
+        state = {
+            'country': self.country_name,
+            'min_radius': min_r,
+            'max_radius': max_r,
+            'complete': self.is_complete,
+            'circles': len(self.resulting_circles),
+            'uncovered_remainder': {'grid_from_row': grid[0]['row'] if grid else None,
+                                    'border_cells': len(border_cells), 'islands': len(islands)},
+            'pending': self.pending_work,
+        }
+
+        file_path = self.state_path(min_r, max_r, temp_dir)
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file, indent=2)
+
+        return os.path.abspath(file_path)
+
+    def load_state(self, country_name, min_r, max_r, temp_dir=False) -> dict | None:
+        """Loads generation state of given country saved by previous run, if there is one"""
+        file_path = self.state_path(min_r, max_r, temp_dir, country_name)
+        if not os.path.exists(file_path):
+            return None
+
+        with open(file_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def compute_metrics(self) -> dict:
+        """Estimates coverage and overlap of last generated circles, see metrics.compute_coverage_metrics"""
+        if self.verbose:
+            print("Computing coverage metrics...")
+
+        return compute_coverage_metrics(self.polygon,
+                                        [circle.coordinates[0] for circle in self.resulting_circles],
+                                        [circle.coordinates[1] for circle in self.resulting_circles],
+                                        [circle.radius for circle in self.resulting_circles])
 
     def countries_list(self):
         """Returns list with all countries names"""
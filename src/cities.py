@@ -0,0 +1,172 @@
+import geopandas as gpd
+import requests
+from shapely.geometry import shape
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+import os
+import threading
+import time
+
+from src.circles import CirclesGenerator
+from src.metrics import save_metrics
+
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"  # Nominatim free-form search endpoint
+USER_AGENT = "SocialProxy-Countries_circles"  # Nominatim usage policy requires identifying the application
+MAX_DEFAULT_WORKERS = 4  # Each worker process loads world and states datasets, so their default amount is capped
+
+_worker_generator = None  # Circles generator of a pool worker process, created once per process
+
+
+class RateLimiter:
+    """Spaces out calls shared between threads, so that no more than given amount of calls per second is made"""
+    def __init__(self, requests_per_second=1.0):
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Blocks calling thread until it's allowed to make next call"""
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def _init_worker(verbose):
+    """Loads datasets once per pool process"""
+    global _worker_generator
+    _worker_generator = CirclesGenerator(verbose=verbose)
+
+
+def _generate_city(city_name, geometry, min_r, max_r, prune_threshold=None, placement='grid', metrics=False) -> str:
+    """
+    Generates circles for already fetched city shape and saves them to CSV file. Runs inside pool worker.
+    :return: String with result message
+    """
+    city_shape = gpd.GeoDataFrame(geometry=[geometry], crs='EPSG:4326')
+    circles_status = _worker_generator.generate_circles(city_name, min_r, max_r, is_a_city=True, shape=city_shape,
+                                                        placement=placement)
+    if type(circles_status) == str:
+        return f'{city_name}: {circles_status}'
+
+    if prune_threshold is not None:
+        _worker_generator.prune_redundant_circles(prune_threshold)
+    _worker_generator.add_areas_names()
+    file_name = _worker_generator.save_csv(min_r=min_r, max_r=max_r)
+    if metrics:
+        save_metrics(_worker_generator.compute_metrics(), file_name)
+    return f'{city_name}: CSV file was saved to {file_name}'
+
+
+class CityBatchProcessor:
+    """
+    Generates circles for a batch of cities. City shapes are fetched from Nominatim concurrently, and each shape is
+    passed to a pool of processes generating circles as soon as it arrives, so network calls overlap with geometry work.
+    """
+    def __init__(self, min_r, max_r, concurrency=4, workers=None, requests_per_second=1.0,
+                 nominatim_url=NOMINATIM_URL, prune_threshold=None, placement='grid', metrics=False, verbose=False):
+        """
+        :param min_r:
+        :param max_r: Min and max radius of circles, in kilometers
+        :param concurrency: Max amount of simultaneous requests to Nominatim
+        :param workers: Amount of processes generating circles. Each of them keeps its own copy of world and states
+        datasets in memory. Defaults to amount of CPUs, but not more than MAX_DEFAULT_WORKERS
+        :param requests_per_second: Max amount of requests to Nominatim per second. Public instance allows only 1
+        :param nominatim_url: Nominatim search endpoint, can point to self-hosted instance or local stub server
+        :param prune_threshold: If given, redundant circles are pruned with this threshold before saving
+        :param placement: Circles placement mode, see CirclesGenerator.generate_circles
+        :param metrics: If true, coverage metrics are saved next to each CSV file
+        """
+        self.min_r = min_r
+        self.max_r = max_r
+        self.concurrency = concurrency
+        self.workers = workers or min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS)
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.nominatim_url = nominatim_url
+        self.prune_threshold = prune_threshold
+        self.placement = placement
+        self.metrics = metrics
+        self.verbose = verbose
+
+    @staticmethod
+    def read_city_names(file_path) -> list:
+        """Reads city names from text file, one per line. Empty lines and lines starting with # are skipped"""
+        with open(file_path, encoding='utf-8') as file:
+            return [line.strip() for line in file if line.strip() and not line.strip().startswith('#')]
+
+    def fetch_city_shape(self, city_name):
+        """
+        Calls Nominatim API to get shape of given city
+        :param city_name: City name in a free-form query format, e.g. "City, Country"
+        :return: Shapely geometry of a city or None, if no city with area shape was found
+        """
+        self.rate_limiter.wait()
+        response = requests.get(self.nominatim_url,
+                                params={'q': city_name, 'format': 'json', 'polygon_geojson': 1, 'limit': 5},
+                                headers={'User-Agent': USER_AGENT},
+                                timeout=60)
+        response.raise_for_status()
+
+        # Nominatim can also return points and lines (e.g. city centre node), we need only areas
+        for place in response.json():
+            geojson = place.get('geojson')
+            if geojson and geojson['type'] in ('Polygon', 'MultiPolygon'):
+                return shape(geojson)
+
+        return None
+
+    def run(self, city_names):
+        """
+        Fetches shapes and generates circles for all given cities. Failure of one city doesn't stop the others.
+        :param city_names: List with city names
+        :return: Generator of result messages, each city's message is yielded as soon as it's ready
+        """
+        generation_futures = {}
+
+        # Fetcher threads are already running when pool starts its workers, and forking a process with running
+        # threads can deadlock the child, so workers are spawned
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(self.verbose,)) as pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as fetchers:
+            fetch_futures = {fetchers.submit(self.fetch_city_shape, city_name): city_name for city_name in city_names}
+            pending = set(fetch_futures)
+
+            # Hand each shape over to generation pool as soon as it's fetched, and report each city as soon as it's done
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetch_futures:
+                        city_name = fetch_futures[future]
+                        try:
+                            geometry = future.result()
+                        except Exception as e:
+                            yield f'{city_name}: Failed to fetch city shape ({e})'
+                            continue
+
+                        if geometry is None:
+                            yield f'{city_name}: City not found in the dataset'
+                            continue
+
+                        if self.verbose:
+                            print(f'{city_name} shape fetched, generating circles...')
+                        try:
+                            generation_future = pool.submit(_generate_city, city_name, geometry, self.min_r,
+                                                            self.max_r, self.prune_threshold, self.placement,
+                                                            self.metrics)
+                        except Exception as e:  # Pool is broken, e.g. worker failed to load datasets
+                            yield f'{city_name}: Failed to generate circles ({e})'
+                            continue
+                        generation_futures[generation_future] = city_name
+                        pending.add(generation_future)
+
+                    else:
+                        try:
+                            message = future.result()
+                        except Exception as e:
+                            message = f'{generation_futures[future]}: Failed to generate circles ({e})'
+                        yield message
@@ -0,0 +1,119 @@
+import csv
+import json
+import os
+import tempfile
+import zlib
+
+
+def circle_key(latitude, longitude, radius, coordinate_step=1e-6, radius_step=0.01) -> str:
+    """
+    Returns stable key of a circle: its center and radius quantized to given steps, so that tiny floating point
+    differences between runs don't count as changes
+    :param latitude:
+    :param longitude: Coordinates of circle center
+    :param radius: Radius of circle in kilometers
+    :param coordinate_step: Quantization step of coordinates in degrees. Default is about 0.1 m
+    :param radius_step: Quantization step of radius in kilometers
+    """
+    return (f'{round(float(latitude) / coordinate_step)}:{round(float(longitude) / coordinate_step)}'
+            f':{round(float(radius) / radius_step)}')
+
+
+def delta_paths(csv_path) -> dict:
+    """Returns paths of delta files that belong to given CSV file"""
+    base_path = os.path.splitext(csv_path)[0]
+    return {
+        'added': f'{base_path}.added.csv',
+        'removed': f'{base_path}.removed.csv',
+        'summary': f'{base_path}.delta.json',
+    }
+
+
+def _partition(csv_path, dir_path, name, buckets) -> tuple:
+    """
+    Splits CSV file with circles into bucket files by hash of circle key, so that the same circles of old and new
+    file end up in buckets with the same number
+    :return: Tuple with header of CSV file and amount of rows
+    """
+    files = [open(os.path.join(dir_path, f'{name}_{i}.csv'), 'w', newline='', encoding='utf-8') for i in range(buckets)]
+    writers = [csv.writer(file) for file in files]
+    rows_count = 0
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            if not header:  # Empty file has no circles
+                return header, rows_count
+            latitude, longitude, radius = header.index('Latitude'), header.index('Longitude'), header.index('Radius')
+            for row in reader:
+                key = circle_key(row[latitude], row[longitude], row[radius])
+                writers[zlib.crc32(key.encode()) % buckets].writerow([key] + row)
+                rows_count += 1
+    finally:
+        for file in files:
+            file.close()
+
+    return header, rows_count
+
+
+def diff_csv_files(old_path, new_path, buckets=None) -> dict:
+    """
+    Compares two CSV files with circles by circle keys and saves circles added and removed in the new file next
+    to it (see delta_paths), along with a summary. Both files are first split into buckets by key hash and then
+    compared bucket by bucket, so only one bucket of old file is kept in memory at a time.
+    :param old_path: Path to previous output
+    :param new_path: Path to new output
+    :param buckets: Amount of buckets. By default, chosen so that each bucket of old file takes about 8 MB
+    :return: Dict with summary: amount of circles in both files, added, removed and unchanged ones
+    """
+    if buckets is None:
+        buckets = os.path.getsize(old_path) // (8 * 2 ** 20) + 1
+
+    paths = delta_paths(new_path)
+    added, removed, unchanged = 0, 0, 0
+
+    with tempfile.TemporaryDirectory() as dir_path:
+        header, old_count = _partition(old_path, dir_path, 'old', buckets)
+        new_header, new_count = _partition(new_path, dir_path, 'new', buckets)
+
+        with open(paths['added'], 'w', newline='', encoding='utf-8') as added_file, \
+                open(paths['removed'], 'w', newline='', encoding='utf-8') as removed_file:
+            added_writer, removed_writer = csv.writer(added_file), csv.writer(removed_file)
+            # Empty file has no header, so header of the other one is taken
+            added_writer.writerow(new_header or header)
+            removed_writer.writerow(header or new_header)
+
+            for i in range(buckets):
+                # Same circle can appear several times, so each key keeps a list of rows
+                old_rows = {}
+                with open(os.path.join(dir_path, f'old_{i}.csv'), newline='', encoding='utf-8') as file:
+                    for key, *row in csv.reader(file):
+                        old_rows.setdefault(key, []).append(row)
+
+                with open(os.path.join(dir_path, f'new_{i}.csv'), newline='', encoding='utf-8') as file:
+                    for key, *row in csv.reader(file):
+                        if old_rows.get(key):
+                            old_rows[key].pop()
+                            unchanged += 1
+                        else:
+                            added_writer.writerow(row)
+                            added += 1
+
+                for rows in old_rows.values():
+                    removed_writer.writerows(rows)
+                    removed += len(rows)
+
+    summary = {
+        'old_file': os.path.abspath(old_path),
+        'new_file': os.path.abspath(new_path),
+        'old_circles': old_count,
+        'new_circles': new_count,
+        'added': added,
+        'removed': removed,
+        'unchanged': unchanged,
+        'changed_share': (added + removed) / (old_count + new_count) if old_count + new_count else 0,
+    }
+    with open(paths['summary'], 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+
+    return summary
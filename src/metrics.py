@@ -0,0 +1,179 @@
+import numpy as np
+import shapely
+
+import json
+import os
+
+
+def compute_coverage_metrics(polygon, xs, ys, radii_km, max_pixels=1_000_000, gaps_count=10) -> dict:
+    """
+    Estimates how well circles cover given shape. Shape bounding box is rasterized into pixels of equal size in
+    kilometers, and every circle adds 1 to pixels whose centers it covers, so no polygon unions are needed.
+    :param polygon: Country shape
+    :param xs:
+    :param ys: Longitudes and latitudes of circles centers
+    :param radii_km: Radii of circles in kilometers
+    :param max_pixels: Approximate amount of pixels in raster. More pixels give more precise result but take longer
+    :param gaps_count: Amount of the biggest uncovered holes to list
+    :return: Dict with metrics:
+    coverage - share of shape area covered by circles,
+    overlap_factor - average amount of circles over covered area (1 means no overlaps),
+    largest_gap_km2 - area of the biggest uncovered hole,
+    gaps - biggest uncovered holes with their area and location
+    """
+    xs, ys, radii_km = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), np.asarray(radii_km, dtype=float)
+    minx, miny, maxx, maxy = polygon.bounds
+
+    # Pixel size in kilometers, so that raster has about max_pixels pixels
+    mid_x_scale_fact = np.cos(np.radians((miny + maxy) / 2))
+    width_km = (maxx - minx) * 111 * mid_x_scale_fact
+    height_km = (maxy - miny) * 111
+    pixel_km = max(np.sqrt(width_km * height_km / max_pixels), 1e-3)
+    dx = pixel_km / (111 * mid_x_scale_fact)
+    dy = pixel_km / 111
+    pixels_x = minx + dx * (np.arange(int(np.ceil((maxx - minx) / dx))) + 0.5)
+    pixels_y = miny + dy * (np.arange(int(np.ceil((maxy - miny) / dy))) + 0.5)
+
+    # Pixels area differs by latitude, so each row gets its own weight
+    row_areas = (dy * 111) * (dx * 111 * np.cos(np.radians(pixels_y)))
+
+    shapely.prepare(polygon)
+    grid_x, grid_y = np.meshgrid(pixels_x, pixels_y)
+    land = shapely.contains_xy(polygon, grid_x, grid_y)
+
+    # Count circles over each pixel, touching only pixels within circle bounding box
+    counts = np.zeros(land.shape, dtype=np.int32)
+    for x, y, radius_km in zip(xs, ys, radii_km):
+        radius_deg = radius_km / 111
+        x_scale_fact = np.cos(np.radians(y))
+        radius_deg_lon = radius_deg / x_scale_fact
+        col_from, col_to = np.searchsorted(pixels_x, [x - radius_deg_lon, x + radius_deg_lon])
+        row_from, row_to = np.searchsorted(pixels_y, [y - radius_deg, y + radius_deg])
+        in_circle = (((pixels_x[col_from:col_to] - x) * x_scale_fact)[None, :] ** 2
+                     + (pixels_y[row_from:row_to] - y)[:, None] ** 2) <= radius_deg ** 2
+        counts[row_from:row_to, col_from:col_to] += in_circle
+
+    land_area = (land * row_areas[:, None]).sum()
+    covered = land & (counts > 0)
+    covered_area = (covered * row_areas[:, None]).sum()
+    circles_area = (counts * land * row_areas[:, None]).sum()
+
+    gaps = find_gaps(land & (counts == 0), pixels_x, pixels_y, row_areas)
+
+    return {
+        'circles': len(xs),
+        'area_km2': round(float(land_area), 3),
+        'coverage': float(covered_area / land_area) if land_area else None,
+        'overlap_factor': float(circles_area / covered_area) if covered_area else None,
+        'uncovered_area_km2': round(float(land_area - covered_area), 3),
+        'gaps_total': len(gaps),
+        'largest_gap_km2': gaps[0]['area_km2'] if gaps else 0,
+        'gaps': gaps[:gaps_count],
+        'pixel_km': round(float(pixel_km), 4),
+    }
+
+
+def find_gaps(uncovered, pixels_x, pixels_y, row_areas) -> list:
+    """
+    Finds connected holes in uncovered pixels. Rows are split in runs of uncovered pixels, and runs overlapping
+    between neighbouring rows are merged, which is much faster than walking pixel by pixel.
+    :param uncovered: 2D boolean array with uncovered pixels of a shape
+    :param pixels_x:
+    :param pixels_y: Longitudes and latitudes of pixels centers
+    :param row_areas: Area of one pixel in each row, in square kilometers
+    :return: List of holes with area in square kilometers and location of their center, biggest first
+    """
+    # Runs of uncovered pixels in each row: [row, first column, column after last]
+    runs = []
+    row_runs = []
+    for row, row_pixels in enumerate(uncovered):
+        edges = np.diff(np.concatenate([[0], row_pixels.view(np.int8), [0]]))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        row_runs.append(range(len(runs), len(runs) + len(starts)))
+        runs += [(row, start, end) for start, end in zip(starts, ends)]
+
+    parents = list(range(len(runs)))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    # Merge runs that overlap with runs in previous row
+    for row in range(1, len(row_runs)):
+        previous, current = row_runs[row - 1], row_runs[row]
+        i, j = previous.start, current.start
+        while i < previous.stop and j < current.stop:
+            _, start_a, end_a = runs[i]
+            _, start_b, end_b = runs[j]
+            if start_a < end_b and start_b < end_a:
+                parents[find(i)] = find(j)
+            if end_a < end_b:
+                i += 1
+            else:
+                j += 1
+
+    # Sum area and area-weighted center for each hole
+    x_cumsum = np.concatenate([[0], np.cumsum(pixels_x)])
+    gaps = {}
+    for i, (row, start, end) in enumerate(runs):
+        area = row_areas[row] * (end - start)
+        gap = gaps.setdefault(find(i), [0, 0, 0])
+        gap[0] += area
+        gap[1] += row_areas[row] * (x_cumsum[end] - x_cumsum[start])
+        gap[2] += area * pixels_y[row]
+
+    gaps = [{'area_km2': round(float(area), 3),
+             'latitude': round(float(y_sum / area), 7),
+             'longitude': round(float(x_sum / area), 7)}
+            for area, x_sum, y_sum in gaps.values()]
+    return sorted(gaps, key=lambda gap: gap['area_km2'], reverse=True)
+
+
+def metrics_path(csv_path) -> str:
+    """Returns path of metrics file that belongs to given CSV file"""
+    return f'{os.path.splitext(csv_path)[0]}.metrics.json'
+
+
+def save_metrics(metrics, csv_path) -> str:
+    """
+    Saves metrics in JSON file next to CSV file with circles
+    :return: String with resulted file name
+    """
+    file_path = metrics_path(csv_path)
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(metrics, file, indent=2)
+
+    return os.path.abspath(file_path)
+
+
+def aggregate_metrics(metrics_by_country, worst_count=10) -> dict:
+    """
+    Combines metrics of several countries into one
+    :param metrics_by_country: Dict with country names and their metrics
+    :param worst_count: Amount of countries with the lowest coverage to list
+    :return: Dict with area-weighted coverage and overlap factor, the largest gap and the least covered countries
+    """
+    metrics_by_country = {name: m for name, m in metrics_by_country.items() if m['area_km2']}
+    area = sum(m['area_km2'] for m in metrics_by_country.values())
+    covered_area = sum(m['area_km2'] * m['coverage'] for m in metrics_by_country.values())
+    circles_area = sum(m['area_km2'] * m['coverage'] * (m['overlap_factor'] or 0) for m in metrics_by_country.values())
+
+    largest_gap = {'country': None, 'area_km2': 0}
+    for name, m in metrics_by_country.items():
+        if m['gaps'] and m['gaps'][0]['area_km2'] > largest_gap['area_km2']:
+            largest_gap = {'country': name, **m['gaps'][0]}
+
+    least_covered = sorted(metrics_by_country.items(), key=lambda item: item[1]['coverage'])[:worst_count]
+
+    return {
+        'countries': len(metrics_by_country),
+        'circles': sum(m['circles'] for m in metrics_by_country.values()),
+        'area_km2': round(area, 3),
+        'coverage': covered_area / area if area else None,
+        'overlap_factor': circles_area / covered_area if covered_area else None,
+        'uncovered_area_km2': round(sum(m['uncovered_area_km2'] for m in metrics_by_country.values()), 3),
+        'largest_gap': largest_gap,
+        'least_covered': [{'country': name, 'coverage': m['coverage']} for name, m in least_covered],
+    }
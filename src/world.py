@@ -0,0 +1,167 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from tqdm import tqdm
+
+from src.circles import Circle, crosses_border, grid_rows, make_ovals
+
+
+class WorldLatticeGenerator:
+    """
+    Generates circles for all countries in a world at once. Instead of separate grid for each country, one global
+    lattice of max radius circles is generated, so circles of neighbouring countries are aligned along shared borders
+    and grid work is not repeated. Lattice centers are assigned to countries and states with bulk spatial joins,
+    and only centers near any country boundary are adjusted one by one.
+    """
+    def __init__(self, circles_generator):
+        """
+        :param circles_generator: CirclesGenerator with loaded world and states datasets. It's used to adjust circles
+        on borders, and to prune and save results of each country (see select_country)
+        """
+        self.circles_generator = circles_generator
+        self.circles = {}  # Placeholder for circles of each country - {country name: [Circle, ...]}
+        self.chunk_size = 10000  # Amount of circles shapes built at once, to keep memory usage low
+
+    def generate(self, min_circle_radius, max_circle_radius, country_names=None) -> dict:
+        """
+        Generates circles for all countries
+        :param min_circle_radius: Minimal radius for a circle, in kilometers
+        :param max_circle_radius: Max radius for a circle, in kilometers
+        :param country_names: If given, only these countries are generated. Lattice stays the same, so their circles
+        are still aligned with circles of other countries generated by another run
+        :return: Dict with amount of circles for each country
+        """
+        world = self.circles_generator.world
+        world = world[world.geometry.notna() & ~world.geometry.is_empty & world['name'].notna()]
+        if country_names is not None:
+            world = world[world['name'].isin(country_names)]
+        names = world['name'].to_numpy()
+        geometries = np.array(world.geometry)
+        shapely.prepare(geometries)
+        self.circles = {name: [] for name in names}
+
+        max_radius_deg = max_circle_radius / 111
+
+        # Global lattice, each latitude band has its own distance between centers along longitude. Only centers
+        # close enough to land to touch it are kept
+        xs, ys = self.land_centers(geometries, max_radius_deg)
+        centers = gpd.GeoDataFrame(geometry=shapely.points(xs, ys), crs=world.crs)
+
+        if self.circles_generator.verbose:
+            print(f"Global lattice of {len(centers)} centers generated, assigning them to countries...")
+
+        # Centers closer to country boundary than circle radius have to be adjusted. Circles are stretched along
+        # longitude, so the longest of their semi-axes is taken as distance
+        boundaries_tree = shapely.STRtree(shapely.boundary(geometries))
+        near_centers, near_countries = boundaries_tree.query(centers.geometry.values, predicate='dwithin',
+                                                             distance=max_radius_deg / np.cos(np.radians(ys)))
+        near_pairs = near_centers * len(geometries) + near_countries
+
+        # Other centers within a country are interior ones, their circles fit in entirely
+        land = gpd.sjoin(centers, gpd.GeoDataFrame(geometry=geometries, crs=world.crs), predicate='within')
+        land_centers, land_countries = land.index.to_numpy(), land['index_right'].to_numpy()
+        is_interior = ~np.isin(land_centers * len(geometries) + land_countries, near_pairs)
+        for i, country in zip(land_centers[is_interior], land_countries[is_interior]):
+            self.circles[names[country]].append(Circle(names[country], [round(float(xs[i]), 7), round(float(ys[i]), 7)],
+                                                       round(max_circle_radius)))
+
+        if self.circles_generator.verbose:
+            print(f"{is_interior.sum()} interior circles placed, adjusting {len(near_centers)} circles near borders...")
+
+        with tqdm(total=len(near_centers), desc="Adjusting circles on borders", unit="circle") as pbar:
+            for chunk_from in range(0, len(near_centers), self.chunk_size):
+                chunk_centers = near_centers[chunk_from:chunk_from + self.chunk_size]
+                chunk_countries = near_countries[chunk_from:chunk_from + self.chunk_size]
+                ovals = make_ovals(xs[chunk_centers], ys[chunk_centers], max_radius_deg)
+                fits = shapely.contains(geometries[chunk_countries], ovals)
+                on_border = crosses_border(geometries[chunk_countries], ovals, fits)
+
+                for i, country, circle_fits, circle_on_border in zip(chunk_centers, chunk_countries, fits, on_border):
+                    name = names[country]
+                    if circle_fits:
+                        self.circles[name].append(Circle(name, [round(float(xs[i]), 7), round(float(ys[i]), 7)],
+                                                         round(max_circle_radius)))
+                    elif circle_on_border:
+                        adjusted_circle = self.circles_generator.adjust_border_circle(
+                            name, xs[i], ys[i], geometries[country], min_circle_radius, max_circle_radius)
+                        if adjusted_circle:
+                            self.circles[name].append(adjusted_circle[1])
+                    pbar.update(1)
+
+        # Countries too small for the lattice are processed separately, with min radius circles
+        for name in [name for name, circles in self.circles.items() if not circles]:
+            if self.circles_generator.verbose:
+                print(f"No lattice circles fit in {name}, generating them separately...")
+            self.circles[name] = list(self.circles_generator.generate_circles(name, min_circle_radius, max_circle_radius))
+
+        self.add_areas_names()
+
+        return {name: len(circles) for name, circles in self.circles.items()}
+
+    @staticmethod
+    def land_centers(geometries, radius_deg):
+        """
+        Generates centers of global lattice, whose circles can touch given shapes. Each latitude band keeps only
+        centers within bounding boxes of shapes parts, widened by circle radius, so the empty ocean is skipped while
+        centers stay at the same positions as in lattice over the whole globe (see grid_rows).
+        :param geometries: Array with shapes of countries
+        :param radius_deg: Radius of circles in degrees of latitude (km divided by 111)
+        :return: Arrays with longitudes and latitudes of centers
+        """
+        parts_bounds = shapely.bounds(shapely.get_parts(geometries))
+        xs, ys = [], []
+        for row_xs, row_ys in grid_rows((-180, -90, 180, 90), radius_deg):
+            if not len(row_ys):
+                continue
+
+            y = row_ys[0]
+            in_band = (parts_bounds[:, 1] - radius_deg <= y) & (y <= parts_bounds[:, 3] + radius_deg)
+            if not in_band.any():
+                continue
+
+            # Range of row centers for each part in the band, merged by counting ranges over each center
+            radius_deg_lon = radius_deg / np.cos(np.radians(y))
+            col_from = np.searchsorted(row_xs, parts_bounds[in_band, 0] - radius_deg_lon, side='left')
+            col_to = np.searchsorted(row_xs, parts_bounds[in_band, 2] + radius_deg_lon, side='right')
+            ranges_count = np.zeros(len(row_xs) + 1, dtype=np.int32)
+            np.add.at(ranges_count, col_from, 1)
+            np.add.at(ranges_count, col_to, -1)
+            in_ranges = np.cumsum(ranges_count[:-1]) > 0
+
+            xs.append(row_xs[in_ranges])
+            ys.append(row_ys[in_ranges])
+
+        if not xs:
+            return np.array([]), np.array([])
+        return np.concatenate(xs), np.concatenate(ys)
+
+    def add_areas_names(self):
+        """Adds to each circle name of a state/region where it's located, with one spatial join for all circles"""
+        circles = [circle for country_circles in self.circles.values() for circle in country_circles]
+        if not circles:
+            return
+
+        states = self.circles_generator.states
+        centers = gpd.GeoDataFrame(geometry=shapely.points([circle.coordinates for circle in circles]).reshape(-1),
+                                   crs=states.crs)
+        circles_states = gpd.sjoin(centers, states[['name_en', 'geometry']], predicate='within')
+        circles_states = circles_states[~circles_states.index.duplicated(keep='first')]
+        for i, state_name in zip(circles_states.index, circles_states['name_en']):
+            circles[i].state = state_name
+
+        if self.circles_generator.verbose:
+            print("Circle state names parsed...")
+
+    def select_country(self, country_name):
+        """Makes circles generator hold circles of given country, as if they were generated for it alone"""
+        generator = self.circles_generator
+        circles = self.circles.get(country_name, [])
+        country = generator.world.loc[generator.world['name'] == country_name]
+
+        generator.country_name = country_name
+        generator.polygon = country.geometry.iloc[0] if not country.empty else None
+        generator.bounding_box = shapely.box(*generator.polygon.bounds) if generator.polygon is not None else None
+        generator.resulting_circles = circles
+        generator.filtered_circles = list(make_ovals([circle.coordinates[0] for circle in circles],
+                                                     [circle.coordinates[1] for circle in circles],
+                                                     [circle.radius / 111 for circle in circles]))
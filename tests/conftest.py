@@ -0,0 +1,21 @@
+import geopandas as gpd
+import pytest
+
+from src.circles import CirclesGenerator
+
+
+@pytest.fixture
+def make_generator(monkeypatch):
+    """Creates CirclesGenerator with given world and states datasets instead of ones read from data directory"""
+    def make(world=None, states=None, **kwargs):
+        datasets = {
+            'world-administrative-boundaries': world if world is not None else
+            gpd.GeoDataFrame({'name': []}, geometry=[], crs='EPSG:4326'),
+            'ne_10m_admin_1_states_provinces': states if states is not None else
+            gpd.GeoDataFrame({'name_en': []}, geometry=[], crs='EPSG:4326'),
+        }
+        monkeypatch.setattr(gpd, 'read_file', lambda path: next(dataset for name, dataset in datasets.items()
+                                                                if name in path))
+        return CirclesGenerator(**kwargs)
+
+    return make
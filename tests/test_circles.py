@@ -0,0 +1,40 @@
+import pytest
+from shapely.geometry import box
+
+from src.circles import Circle, make_ovals
+
+
+@pytest.fixture
+def generator(make_generator):
+    """Generator holding circles of a square country: big one, small one inside it, and a lone one far from them"""
+    generator = make_generator()
+    generator.country_name = 'Square'
+    generator.polygon = box(0, 0, 1, 1)
+    xs, ys, radii = [0.3, 0.35, 0.8], [0.3, 0.3, 0.8], [20, 5, 5]
+    generator.filtered_circles = list(make_ovals(xs, ys, [radius / 111 for radius in radii]))
+    generator.resulting_circles = [Circle('Square', [x, y], radius) for x, y, radius in zip(xs, ys, radii)]
+    return generator
+
+
+def test_prune_removes_covered_circle(generator):
+    report = generator.prune_redundant_circles()
+
+    assert report == {'removed': 1, 'kept': 2, 'coverage_change': 0}
+    assert [circle.radius for circle in generator.resulting_circles] == [20, 5]
+    assert [circle.coordinates for circle in generator.resulting_circles] == [[0.3, 0.3], [0.8, 0.8]]
+    assert len(generator.filtered_circles) == 2
+
+
+def test_prune_keeps_partly_covered_circle(generator):
+    generator.resulting_circles[1].coordinates = [0.45, 0.3]
+    generator.filtered_circles[1] = make_ovals([0.45], [0.3], 5 / 111)[0]
+    partly_covered = generator.filtered_circles[1]
+    uncovered_area = partly_covered.difference(generator.filtered_circles[0]).area
+
+    assert generator.prune_redundant_circles()['removed'] == 0
+
+    report = generator.prune_redundant_circles(coverage_threshold=0.5)
+
+    assert (report['removed'], report['kept']) == (1, 2)
+    assert report['coverage_change'] == pytest.approx(-uncovered_area / generator.polygon.area)
+    assert [circle.radius for circle in generator.resulting_circles] == [20, 5]
@@ -0,0 +1,130 @@
+import csv
+import http.server
+import json
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+import pytest
+import shapely
+from shapely.geometry import shape
+
+from src import cities
+from src.cities import CityBatchProcessor
+
+# Stub Nominatim responses for each query
+PLACES = {
+    'Square, Nowhere': [
+        {'geojson': {'type': 'Point', 'coordinates': [12.1, 45.1]}},
+        {'geojson': {'type': 'Polygon', 'coordinates': [[[12, 45], [12.3, 45], [12.3, 45.2], [12, 45.2], [12, 45]]]}},
+    ],
+    'Broken, Nowhere': [
+        {'geojson': {'type': 'Polygon', 'coordinates': [[[12, 45]]]}},
+    ],
+    'Failing, Nowhere': [
+        {'geojson': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}},
+    ],
+}
+
+
+@pytest.fixture
+def nominatim():
+    """Local stub of Nominatim search endpoint, which records queries and their time"""
+    queries = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)['q'][0]
+            queries.append((time.monotonic(), query))
+            if query == 'Error, Nowhere':
+                self.send_response(500)
+                self.end_headers()
+                return
+            body = json.dumps(PLACES.get(query, [])).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/search', queries
+    server.shutdown()
+
+
+def _init_fake_worker(verbose):
+    pass
+
+
+def _generate_fake_city(city_name, geometry, *args):
+    if city_name.startswith('Failing'):
+        raise ValueError('generation failed')
+    return f'{city_name}: {geometry.geom_type} generated'
+
+
+def test_fetch_city_shape_returns_area(nominatim):
+    url, _ = nominatim
+    processor = CityBatchProcessor(1, 10, nominatim_url=url, requests_per_second=0)
+
+    assert processor.fetch_city_shape('Square, Nowhere').bounds == (12, 45, 12.3, 45.2)
+    assert processor.fetch_city_shape('Unknown, Nowhere') is None
+
+
+def test_fetch_city_shape_is_rate_limited(nominatim):
+    url, queries = nominatim
+    processor = CityBatchProcessor(1, 10, concurrency=4, nominatim_url=url, requests_per_second=10)
+    with ThreadPoolExecutor(max_workers=4) as fetchers:
+        shapes = list(fetchers.map(processor.fetch_city_shape, ['Square, Nowhere'] * 4))
+
+    assert all(city_shape is not None for city_shape in shapes)
+    times = sorted(query_time for query_time, _ in queries)
+    assert all(later - earlier >= 0.09 for earlier, later in zip(times, times[1:]))
+
+
+def test_run_isolates_failures(nominatim, monkeypatch):
+    url, _ = nominatim
+    monkeypatch.setattr(cities, '_init_worker', _init_fake_worker)
+    monkeypatch.setattr(cities, '_generate_city', _generate_fake_city)
+    processor = CityBatchProcessor(1, 10, concurrency=2, workers=1, nominatim_url=url, requests_per_second=0)
+
+    messages = list(processor.run(['Square, Nowhere', 'Broken, Nowhere', 'Error, Nowhere', 'Unknown, Nowhere',
+                                   'Failing, Nowhere']))
+
+    results = {message.split(': ', 1)[0]: message.split(': ', 1)[1] for message in messages}
+    assert len(messages) == 5
+    assert results['Square, Nowhere'] == 'Polygon generated'
+    assert results['Unknown, Nowhere'] == 'City not found in the dataset'
+    assert results['Failing, Nowhere'] == 'Failed to generate circles (generation failed)'
+    assert results['Broken, Nowhere'].startswith('Failed to fetch city shape')
+    assert results['Error, Nowhere'].startswith('Failed to fetch city shape')
+
+
+def test_generate_city_saves_csv_and_metrics(make_generator, monkeypatch, tmp_path):
+    square = shape(PLACES['Square, Nowhere'][1]['geojson'])
+    states = gpd.GeoDataFrame({'name_en': ['Square State']}, geometry=[square], crs='EPSG:4326')
+    monkeypatch.setattr(cities, '_worker_generator', make_generator(states=states))
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('output_files')
+
+    message = cities._generate_city('Square, Nowhere', square, 1, 10, prune_threshold=0.95, placement='ladder',
+                                    metrics=True)
+
+    file_path = os.path.abspath('output_files/Square, Nowhere__1-10.csv')
+    assert message == f'Square, Nowhere: CSV file was saved to {file_path}'
+    with open(file_path, newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    assert rows
+    assert all(row['Region'] == 'Square, Nowhere_Square State' for row in rows)
+    assert all(shapely.contains_xy(square, float(row['Longitude']), float(row['Latitude'])) for row in rows)
+    assert all(1 <= float(row['Radius']) <= 10 for row in rows)
+    with open('output_files/Square, Nowhere__1-10.metrics.json', encoding='utf-8') as file:
+        metrics = json.load(file)
+    assert metrics['circles'] == len(rows)
+    assert metrics['coverage'] > 0.5
+
@@ -0,0 +1,105 @@
+import csv
+import json
+
+import pytest
+
+from src.delta import circle_key, delta_paths, diff_csv_files
+
+HEADER = ['Region', 'Latitude', 'Longitude', 'Radius']
+
+
+def write_csv(path, rows, header=True):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if header:
+            writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return list(csv.reader(file))
+
+
+def test_circle_key_ignores_float_jitter():
+    assert circle_key(45.1234561, 12.5, 10) == circle_key('45.12345612', 12.50000001, 10.0000001)
+    assert circle_key(45.123456, 12.5, 10) != circle_key(45.123457, 12.5, 10)
+    assert circle_key(45.123456, 12.5, 10) != circle_key(45.123456, 12.5, 10.5)
+
+
+def test_diff_csv_files_finds_added_and_removed(tmp_path):
+    old = write_csv(tmp_path / 'old.csv', [['A', 45.0, 12.0, 10], ['A', 45.2, 12.0, 10], ['A', 45.4, 12.0, 5]])
+    new = write_csv(tmp_path / 'new.csv', [['A', 45.0, 12.0, 10], ['A', 45.2, 12.0, 10], ['A', 45.4, 12.0, 2.5]])
+
+    summary = diff_csv_files(old, new)
+
+    paths = delta_paths(new)
+    assert (summary['added'], summary['removed'], summary['unchanged']) == (1, 1, 2)
+    assert summary['changed_share'] == pytest.approx(2 / 6)
+    assert read_rows(paths['added']) == [HEADER, ['A', '45.4', '12.0', '2.5']]
+    assert read_rows(paths['removed']) == [HEADER, ['A', '45.4', '12.0', '5']]
+    with open(paths['summary'], encoding='utf-8') as file:
+        assert json.load(file) == summary
+
+
+def test_diff_csv_files_counts_duplicates(tmp_path):
+    old = write_csv(tmp_path / 'old.csv', [['A', 45.0, 12.0, 10], ['A', 45.0, 12.0, 10], ['A', 45.0, 12.0, 10]])
+    new = write_csv(tmp_path / 'new.csv', [['A', 45.0, 12.0, 10], ['B', 46.0, 13.0, 10]])
+
+    summary = diff_csv_files(old, new)
+
+    assert (summary['added'], summary['removed'], summary['unchanged']) == (1, 2, 1)
+    assert read_rows(delta_paths(new)['removed'])[1:] == [['A', '45.0', '12.0', '10'], ['A', '45.0', '12.0', '10']]
+
+
+def test_diff_csv_files_ignores_float_jitter(tmp_path):
+    old = write_csv(tmp_path / 'old.csv', [['A', 45.1234561, 12.7654321, 10]])
+    new = write_csv(tmp_path / 'new.csv', [['A', 45.12345612, 12.76543209, 10.0000001]])
+
+    summary = diff_csv_files(old, new)
+
+    assert (summary['added'], summary['removed'], summary['unchanged']) == (0, 0, 1)
+
+
+def test_diff_csv_files_with_many_buckets(tmp_path):
+    old_rows = [['A', 40 + i / 100, 10 + i / 50, 10] for i in range(200)]
+    new_rows = old_rows[50:] + [['A', 50 + i / 100, 10, 5] for i in range(30)]
+    old = write_csv(tmp_path / 'old.csv', old_rows)
+    new = write_csv(tmp_path / 'new.csv', new_rows)
+
+    one_bucket = diff_csv_files(old, new, buckets=1)
+    added, removed = read_rows(delta_paths(new)['added']), read_rows(delta_paths(new)['removed'])
+    many_buckets = diff_csv_files(old, new, buckets=7)
+
+    assert (many_buckets['added'], many_buckets['removed'], many_buckets['unchanged']) == (30, 50, 150)
+    assert {key: many_buckets[key] for key in ('added', 'removed', 'unchanged')} == \
+        {key: one_bucket[key] for key in ('added', 'removed', 'unchanged')}
+    assert sorted(read_rows(delta_paths(new)['added'])) == sorted(added)
+    assert sorted(read_rows(delta_paths(new)['removed'])) == sorted(removed)
+
+
+@pytest.mark.parametrize('header', [True, False])
+def test_diff_csv_files_with_empty_file(tmp_path, header):
+    empty = write_csv(tmp_path / 'empty.csv', [], header=header)
+    new = write_csv(tmp_path / 'new.csv', [['A', 45.0, 12.0, 10], ['A', 45.2, 12.0, 10]])
+
+    summary = diff_csv_files(empty, new)
+
+    assert (summary['old_circles'], summary['new_circles']) == (0, 2)
+    assert (summary['added'], summary['removed'], summary['unchanged']) == (2, 0, 0)
+    assert read_rows(delta_paths(new)['removed']) == [HEADER]
+
+    summary = diff_csv_files(new, empty)
+
+    assert (summary['added'], summary['removed'], summary['unchanged']) == (0, 2, 0)
+    assert summary['changed_share'] == 1
+
+
+def test_diff_csv_files_with_both_files_empty(tmp_path):
+    old = write_csv(tmp_path / 'old.csv', [], header=False)
+    new = write_csv(tmp_path / 'new.csv', [])
+
+    summary = diff_csv_files(old, new)
+
+    assert (summary['old_circles'], summary['new_circles'], summary['changed_share']) == (0, 0, 0)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+import main
+from src.metrics import aggregate_metrics, compute_coverage_metrics, find_gaps
+
+# Box of about 5.5 x 5.5 km on the equator, and radius of circle in its center that covers it entirely
+BOX = box(0, 0, 0.05, 0.05)
+BOX_AREA_KM2 = (0.05 * 111) ** 2
+COVERING_RADIUS_KM = 0.05 * 111
+
+
+def test_box_inside_one_circle_is_covered():
+    metrics = compute_coverage_metrics(BOX, [0.025], [0.025], [COVERING_RADIUS_KM], max_pixels=10000)
+
+    assert metrics['circles'] == 1
+    assert metrics['area_km2'] == pytest.approx(BOX_AREA_KM2, rel=1e-3)
+    assert metrics['coverage'] == 1.0
+    assert metrics['overlap_factor'] == 1.0
+    assert (metrics['gaps_total'], metrics['largest_gap_km2'], metrics['uncovered_area_km2']) == (0, 0, 0)
+
+
+def test_identical_circles_overlap_twice():
+    metrics = compute_coverage_metrics(BOX, [0.025, 0.025], [0.025, 0.025], [COVERING_RADIUS_KM] * 2, max_pixels=10000)
+
+    assert metrics['coverage'] == 1.0
+    assert metrics['overlap_factor'] == pytest.approx(2.0)
+
+
+def test_box_without_circles_is_one_gap():
+    metrics = compute_coverage_metrics(BOX, [], [], [], max_pixels=10000)
+
+    assert metrics['coverage'] == 0
+    assert metrics['overlap_factor'] is None
+    assert metrics['gaps_total'] == 1
+    assert metrics['largest_gap_km2'] == pytest.approx(BOX_AREA_KM2, rel=1e-3)
+    assert metrics['gaps'][0]['latitude'] == pytest.approx(0.025, abs=1e-3)
+    assert metrics['gaps'][0]['longitude'] == pytest.approx(0.025, abs=1e-3)
+
+
+def test_find_gaps_merges_connected_runs():
+    uncovered = np.array([
+        [1, 1, 0, 0, 1],
+        [0, 1, 0, 0, 1],
+        [0, 1, 1, 0, 0],
+        [0, 0, 0, 0, 1],
+    ], dtype=bool)
+
+    gaps = find_gaps(uncovered, np.arange(5.0), np.arange(4.0), np.ones(4))
+
+    assert [gap['area_km2'] for gap in gaps] == [5, 2, 1]
+    assert (gaps[1]['longitude'], gaps[1]['latitude']) == (4, 0.5)
+    assert (gaps[2]['longitude'], gaps[2]['latitude']) == (4, 3)
+
+
+def test_aggregate_metrics_weights_by_area():
+    world_metrics = aggregate_metrics({
+        'Big': {'circles': 10, 'area_km2': 300, 'coverage': 1.0, 'overlap_factor': 1.5, 'uncovered_area_km2': 0,
+                'gaps': []},
+        'Small': {'circles': 1, 'area_km2': 100, 'coverage': 0.5, 'overlap_factor': 1.0, 'uncovered_area_km2': 50,
+                  'gaps': [{'area_km2': 50, 'latitude': 1, 'longitude': 2}]},
+        'Empty': {'circles': 0, 'area_km2': 0, 'coverage': None, 'overlap_factor': None, 'uncovered_area_km2': 0,
+                  'gaps': []},
+    })
+
+    assert world_metrics['countries'] == 2
+    assert world_metrics['circles'] == 11
+    assert world_metrics['coverage'] == pytest.approx(350 / 400)
+    assert world_metrics['overlap_factor'] == pytest.approx((300 * 1.5 + 50) / 350)
+    assert world_metrics['largest_gap'] == {'country': 'Small', 'area_km2': 50, 'latitude': 1, 'longitude': 2}
+    assert world_metrics['least_covered'][0] == {'country': 'Small', 'coverage': 0.5}
+
+
+def test_world_metrics_without_covered_area(capsys):
+    world_metrics = aggregate_metrics({
+        'Empty': {'circles': 0, 'area_km2': 0, 'coverage': None, 'overlap_factor': None, 'uncovered_area_km2': 0,
+                  'gaps': []},
+    })
+
+    assert (world_metrics['coverage'], world_metrics['overlap_factor']) == (None, None)
+    main.print_world_metrics(world_metrics)
+    assert capsys.readouterr().out == 'World coverage: N/A, overlap factor: N/A\n'
@@ -0,0 +1,49 @@
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon, Point, box
+
+from src.circles import crosses_border, grid_centers, make_ovals
+from src.world import WorldLatticeGenerator
+
+COUNTRIES = np.array([
+    box(10, 40, 12, 42),
+    MultiPolygon([box(-179.5, 60, -170, 65), box(170, 60, 179.5, 65), box(150, 58, 150.05, 58.05)]),
+    box(-70, -55, -67, -20),
+])
+
+
+def centers_set(xs, ys):
+    return set(zip(np.round(xs, 9), np.round(ys, 9)))
+
+
+def test_land_centers_are_part_of_global_lattice_and_cover_all_parts():
+    radius_deg = 20 / 111
+    xs, ys = WorldLatticeGenerator.land_centers(COUNTRIES, radius_deg)
+    all_xs, all_ys = grid_centers((-180, -90, 180, 90), radius_deg)
+
+    assert len(xs) == len(centers_set(xs, ys))
+    assert centers_set(xs, ys) <= centers_set(all_xs, all_ys)
+    assert len(xs) < len(all_xs) / 100
+
+    ovals = make_ovals(all_xs, all_ys, radius_deg)
+    for part in shapely.get_parts(COUNTRIES):
+        touching = shapely.intersects(part, ovals)
+        assert touching.any()
+        assert centers_set(all_xs[touching], all_ys[touching]) <= centers_set(xs, ys)
+
+
+def test_land_centers_without_shapes():
+    xs, ys = WorldLatticeGenerator.land_centers(np.array([], dtype=object), 0.1)
+
+    assert len(xs) == len(ys) == 0
+
+
+def test_crosses_border():
+    country = box(0, 0, 1, 1)
+    ovals = np.array([Point(0.5, 0.5).buffer(0.1), Point(1, 0.5).buffer(0.1), Point(3, 3).buffer(0.1),
+                      Point(0.5, 0.5).buffer(2)])
+    inside = shapely.contains(country, ovals)
+
+    assert crosses_border(country, ovals, inside).tolist() == [False, True, False, False]
+    assert crosses_border(np.array([country, country, box(2.9, 2.9, 3, 3), box(0, 0, 3, 3)]), ovals,
+                          inside).tolist() == [False, True, True, True]